@@ -972,7 +972,7 @@ def start():
         return
     click.echo("Starting NetWatcher service...")
     plist_path = config.LAUNCH_AGENT_PLIST_PATH
-    run_command(["launchctl", "load", "-w", str(plist_path)])
+    run_command([config.LAUNCHCTL, "load", "-w", str(plist_path)])
     click.echo("Service started.")
 
 
@@ -990,7 +990,7 @@ def stop():
         return
     click.echo("Stopping NetWatcher service...")
     plist_path = config.LAUNCH_AGENT_PLIST_PATH
-    run_command(["launchctl", "unload", "-w", str(plist_path)])
+    run_command([config.LAUNCHCTL, "unload", "-w", str(plist_path)])
     click.echo("Service stopped.")
 
 
@@ -1007,7 +1007,7 @@ def status():
         return
     click.echo("Checking service status...")
     label = config.LAUNCH_AGENT_LABEL
-    output = run_command(["launchctl", "list"], capture=True)
+    output = run_command([config.LAUNCHCTL, "list"], capture=True)
     if output and label in output:
         # The output of `launchctl list` is complex. A simple string search is a good indicator.
         # A more robust check could parse the output line for the specific service.
@@ -1090,7 +1090,7 @@ def install():
         click.echo(f"Created launch agent plist at: {plist_path}")
 
         # Load the service
-        run_command(["launchctl", "load", "-w", str(plist_path)])
+        run_command([config.LAUNCHCTL, "load", "-w", str(plist_path)])
         click.echo(
             click.style("Service installed and started successfully.", fg="green")
         )
@@ -1113,7 +1113,7 @@ def _unload_and_remove_service():
 
     try:
         # Unload the service first
-        run_command(["launchctl", "unload", "-w", str(plist_path)])
+        run_command([config.LAUNCHCTL, "unload", "-w", str(plist_path)])
         click.echo("Service stopped.")
 
         # Remove the plist file
@@ -5,6 +5,8 @@ This module handles loading, validation, and default configuration values
 for the NetWatcher application.
 """
 
+import copy
+
 import toml
 from pathlib import Path
 
@@ -14,6 +16,7 @@ PLIST_FILENAME = f"com.user.{APP_NAME}.plist"
 LAUNCH_AGENT_LABEL = f"com.user.{APP_NAME}"
 LAUNCH_AGENT_DIR = Path.home() / "Library/LaunchAgents"
 LAUNCH_AGENT_PLIST_PATH = LAUNCH_AGENT_DIR / PLIST_FILENAME
+LAUNCHCTL = "/bin/launchctl"  # absolute path lets subprocess use posix_spawn
 LOG_DIR = Path.home() / "Library" / "Logs"
 LOG_FILE = LOG_DIR / "netwatcher.log"
 
@@ -72,14 +75,14 @@ def get_config_path():
 
 
 def load_config():
-    """Loads the configuration from the TOML file."""
+    """Loads the configuration from the TOML file. Each call returns a new dict."""
     path = get_config_path()
     if not path.exists():
         # Create a default config if one doesn't exist
         path.parent.mkdir(parents=True, exist_ok=True)
         with open(path, "w") as f:
             toml.dump(DEFAULT_CONFIG, f)
-        return DEFAULT_CONFIG
+        return copy.deepcopy(DEFAULT_CONFIG)
 
     with open(path, "r") as f:
         config = toml.load(f)
@@ -92,6 +95,34 @@ def load_config():
     return config
 
 
+# ((path, mtime_ns, size), parsed config) from the last load_config_cached() parse
+_config_cache = None
+
+
+def load_config_cached():
+    """
+    Load the configuration, reusing the last parse while the file is unchanged.
+
+    The file is stat()ed on every call, so edits are picked up immediately.
+    The returned dict is shared between callers and must not be modified; use
+    load_config() to get a private copy.
+    """
+    global _config_cache
+    path = get_config_path()
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return load_config()  # Creates the default config
+
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _config_cache is not None and _config_cache[0] == key:
+        return _config_cache[1]
+
+    config = load_config()
+    _config_cache = (key, config)
+    return config
+
+
 if __name__ == "__main__":
     config = load_config()
     import json
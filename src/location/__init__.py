@@ -6,10 +6,17 @@ and applying location-specific settings.
 """
 
 from .matching import find_matching_location
-from .settings import apply_location_settings, check_and_apply_location_settings
+from .settings import (
+    apply_detected_location,
+    apply_location_settings,
+    check_and_apply_location_settings,
+    detect_location,
+)
 
 __all__ = [
     "find_matching_location",
     "apply_location_settings",
     "check_and_apply_location_settings",
+    "detect_location",
+    "apply_detected_location",
 ]
@@ -78,25 +78,22 @@ def apply_location_settings(
         set_proxy(service_name)  # disable
 
 
-def check_and_apply_location_settings(
+def detect_location(
     cfg,
-    apply=True,
-    fetch_details=True,
     log_level=20,  # INFO level
 ):
-    """Determine current location and apply appropriate settings if apply=True.
+    """Determine the current location from the network state, without applying anything.
 
     Returns:
-        tuple: (location_name, vpn_active, vpn_details)
-            - location_name: str, name of applied location or "Unknown"
+        tuple: (location_name, vpn_active)
+            - location_name: str, name of the matching location or "Unknown"
             - vpn_active: bool, whether VPN is currently active
-            - vpn_details: str or None, VPN connection details if available
     """
     # Get current network information
     network_info = _get_current_network_info(log_level=log_level)
     if not network_info:
         logger.log(log_level, "Could not determine network configuration")
-        return "Unknown", False, None
+        return "Unknown", False
 
     service_name, interface, service_id = network_info
     logger.debug(f"Primary interface: {service_name} ({interface})")
@@ -112,20 +109,15 @@ def check_and_apply_location_settings(
 
     # Check VPN status once
     vpn_active = is_vpn_active(log_level=log_level)
-    vpn_details = None
 
-    if vpn_active:
-        if fetch_details:
-            vpn_details = get_vpn_details()
-
-        # Additional validation for VPN transitions
-        if len(current_search_domains) <= 1:
-            logger.log(
-                log_level,
-                "VPN detected but few search domains - network may be transitioning",
-            )
+    # Additional validation for VPN transitions
+    if vpn_active and len(current_search_domains) <= 1:
+        logger.log(
+            log_level,
+            "VPN detected but few search domains - network may be transitioning",
+        )
 
-    # Find and apply location settings
+    # Find location settings
     location_name = find_matching_location(
         cfg, current_ssid, current_search_domains, vpn_active, log_level=log_level
     )
@@ -134,44 +126,90 @@ def check_and_apply_location_settings(
     logger.debug(f"Available locations: {available_locations}")
     logger.debug(f"Checking if '{location_name}' in available locations")
 
+    if location_name not in cfg.get("locations", {}):
+        logger.warning(f"Location '{location_name}' not found in config")
+        return "Unknown", vpn_active
+
+    return location_name, vpn_active
+
+
+def apply_detected_location(
+    cfg,
+    location_name,
+    vpn_active,
+    fetch_details=True,
+    log_level=20,  # INFO level
+):
+    """Apply the settings for a location found by detect_location().
+
+    The network isn't probed again, so a caller that already detected the
+    location (e.g. to see whether anything changed) doesn't pay for it twice.
+
+    Returns:
+        tuple: (location_name, vpn_active, vpn_details), as for
+        check_and_apply_location_settings()
+    """
+    vpn_details = get_vpn_details() if vpn_active and fetch_details else None
+
     if location_name in cfg.get("locations", {}):
-        if apply:
-            logger.log(log_level, f"Applying settings for location: {location_name}")
-            location_config = cfg["locations"][location_name]
-            proxy_url = location_config.get("proxy_url", "")
-
-            active_services = get_all_active_services()
-            for serv_name, iface in active_services:
-                logger.debug(f"Applying to {serv_name} ({iface})")
-                skip_dns = vpn_active
-                apply_location_settings(
-                    location_config,
-                    serv_name,
-                    iface,
-                    vpn_active,
-                    skip_dns=skip_dns,
-                    proxy_result=proxy_url,
-                )
+        logger.log(log_level, f"Applying settings for location: {location_name}")
+        location_config = cfg["locations"][location_name]
+        proxy_url = location_config.get("proxy_url", "")
+
+        active_services = get_all_active_services()
+        for serv_name, iface in active_services:
+            logger.debug(f"Applying to {serv_name} ({iface})")
+            skip_dns = vpn_active
+            apply_location_settings(
+                location_config,
+                serv_name,
+                iface,
+                vpn_active,
+                skip_dns=skip_dns,
+                proxy_result=proxy_url,
+            )
 
-            # System-wide settings
-            if "printer" in location_config and location_config["printer"]:
-                set_default_printer(location_config["printer"])
-            if "ntp_server" in location_config and location_config["ntp_server"]:
-                set_ntp_server(location_config["ntp_server"])
-
-            # Shell proxy configuration
-            try:
-                dns_search_domains = location_config.get("dns_search_domains", [])
-                update_shell_proxy_configuration(proxy_url, dns_search_domains)
-            except Exception as e:
-                logger.warning(f"Failed to update shell proxy configuration: {e}")
-    else:
-        logger.warning(f"Location '{location_name}' not found in config")
-        return "Unknown", vpn_active, vpn_details
+        # System-wide settings
+        if "printer" in location_config and location_config["printer"]:
+            set_default_printer(location_config["printer"])
+        if "ntp_server" in location_config and location_config["ntp_server"]:
+            set_ntp_server(location_config["ntp_server"])
+
+        # Shell proxy configuration
+        try:
+            dns_search_domains = location_config.get("dns_search_domains", [])
+            update_shell_proxy_configuration(proxy_url, dns_search_domains)
+        except Exception as e:
+            logger.warning(f"Failed to update shell proxy configuration: {e}")
 
     return location_name, vpn_active, vpn_details
 
 
+def check_and_apply_location_settings(
+    cfg,
+    apply=True,
+    fetch_details=True,
+    log_level=20,  # INFO level
+):
+    """Determine current location and apply appropriate settings if apply=True.
+
+    Returns:
+        tuple: (location_name, vpn_active, vpn_details)
+            - location_name: str, name of applied location or "Unknown"
+            - vpn_active: bool, whether VPN is currently active
+            - vpn_details: str or None, VPN connection details if available
+    """
+    location_name, vpn_active = detect_location(cfg, log_level=log_level)
+
+    if apply:
+        return apply_detected_location(
+            cfg, location_name, vpn_active, fetch_details=fetch_details, log_level=log_level
+        )
+
+    vpn_details = get_vpn_details() if vpn_active and fetch_details else None
+    return location_name, vpn_active, vpn_details
+
+
 def create_vpn_resolver_files(search_domains, vpn_dns_servers=None):
     """Create resolver files for each search domain when VPN is active."""
     resolver_dir = Path("/etc/resolver")
@@ -228,15 +266,19 @@ def create_vpn_resolver_files(search_domains, vpn_dns_servers=None):
 def remove_vpn_resolver_files(created_files):
     """Remove previously created resolver files when VPN disconnects."""
     num_files = len(created_files)
-    for file_path in created_files:
-        try:
-            run_command(["sudo", "rm", "-f", str(file_path)])
-            logger.debug(f"Removed resolver file: {file_path}")
-        except Exception as e:
-            logger.error(f"Failed to remove {file_path}: {e}")
+    if num_files == 0:
+        return
 
-    if num_files > 0:
-        logger.info(f"Removed {num_files} resolver files from /etc/resolver")
+    # The files are root-owned, so they go through sudo; one rm for all of them
+    # instead of a sudo process per file. -f already ignores missing files.
+    try:
+        if run_command(["sudo", "rm", "-f", *(str(file_path) for file_path in created_files)]):
+            logger.debug(f"Removed resolver files: {', '.join(map(str, created_files))}")
+            logger.info(f"Removed {num_files} resolver files from /etc/resolver")
+        else:
+            logger.error("Failed to remove resolver files - check sudo permissions")
+    except Exception as e:
+        logger.error(f"Failed to remove resolver files: {e}")
 
 
 def _get_current_network_info(log_level=20):  # INFO level
@@ -6,18 +6,35 @@ NetWatcher application, ensuring consistent formatting, handlers, and levels
 across all modules.
 """
 
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
 from . import config
 
 
+def _stderr_is_discarded() -> bool:
+    """Check whether stderr is redirected to /dev/null, as it is under launchd."""
+    try:
+        stderr_stat = os.fstat(sys.stderr.fileno())
+        devnull_stat = os.stat(os.devnull)
+    except (AttributeError, OSError, ValueError):
+        return False  # No real descriptor (e.g. replaced stream); keep the console handler
+
+    return (stderr_stat.st_dev, stderr_stat.st_ino) == (devnull_stat.st_dev, devnull_stat.st_ino)
+
+
 class NetWatcherLogger:
     """Centralized logger configuration for NetWatcher."""
 
     _initialized = False
     _debug_enabled = False
+    _file_listener: Optional[QueueListener] = None
+    _queue_handler: Optional[QueueHandler] = None
 
     @classmethod
     def setup(cls, debug: bool = False, force_reinit: bool = False) -> None:
@@ -32,6 +49,7 @@ class NetWatcherLogger:
             return
 
         # Clear any existing handlers to avoid duplication
+        cls._stop_file_listener(close=True)
         root_logger = logging.getLogger()
         if root_logger.hasHandlers():
             root_logger.handlers.clear()
@@ -47,8 +65,10 @@ class NetWatcherLogger:
         # Always add file handler
         cls._add_file_handler(root_logger, formatter)
 
-        # Add console handler (for services, stdout/stderr are redirected so no duplication)
-        cls._add_console_handler(root_logger, formatter)
+        # Add console handler, unless stderr is discarded (the launchd plist
+        # points it at /dev/null) and formatting each record would be wasted
+        if not _stderr_is_discarded():
+            cls._add_console_handler(root_logger, formatter)
 
         cls._initialized = True
 
@@ -66,11 +86,46 @@ class NetWatcherLogger:
             file_handler = logging.FileHandler(config.LOG_FILE)
             file_handler.setFormatter(formatter)
             file_handler.setLevel(logging.DEBUG)  # File always gets debug
-            logger.addHandler(file_handler)
+
+            # Records are queued and written by a background thread, so code
+            # that logs (e.g. the SystemConfiguration callback) never waits on
+            # file I/O. The console handler stays synchronous so CLI output
+            # keeps its order.
+            log_queue = queue.SimpleQueue()
+            cls._file_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+            cls._file_listener.start()
+            cls._queue_handler = QueueHandler(log_queue)
+            logger.addHandler(cls._queue_handler)
         except Exception as e:
             # If file logging fails, at least log to console
             print(f"Warning: Could not set up file logging: {e}", file=sys.stderr)
 
+    @classmethod
+    def _stop_file_listener(cls, close: bool = False) -> None:
+        """
+        Flush queued records to the log file and stop the writer thread.
+
+        The queue handler is detached along with its listener, so nothing logs
+        into a queue no one drains. Unless close is set, the file handler takes
+        its place on the root logger and later records (the rest of shutdown,
+        other atexit hooks) are written synchronously.
+        """
+        listener = cls._file_listener
+        if listener is None:
+            return
+
+        cls._file_listener = None
+        listener.stop()
+
+        root_logger = logging.getLogger()
+        root_logger.removeHandler(cls._queue_handler)
+        cls._queue_handler = None
+        for handler in listener.handlers:
+            if close:
+                handler.close()
+            else:
+                root_logger.addHandler(handler)
+
     @classmethod
     def _add_console_handler(cls, logger: logging.Logger, formatter: logging.Formatter) -> None:
         """Add console handler for interactive feedback."""
@@ -116,6 +171,10 @@ class NetWatcherLogger:
             cls.setup(debug=debug, force_reinit=True)
 
 
+# Write out any queued records before the interpreter exits
+atexit.register(NetWatcherLogger._stop_file_listener)
+
+
 # Convenience functions for easy import
 def setup_logging(debug: bool = False, force_reinit: bool = False) -> None:
     """Set up centralized logging. Wrapper for NetWatcherLogger.setup()."""
@@ -135,3 +194,8 @@ def is_debug_enabled() -> bool:
 def set_debug(debug: bool) -> None:
     """Change debug level at runtime. Wrapper for NetWatcherLogger.set_debug()."""
     NetWatcherLogger.set_debug(debug)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and log synchronously from then on. Wrapper for NetWatcherLogger._stop_file_listener()."""
+    NetWatcherLogger._stop_file_listener()
@@ -6,11 +6,11 @@ DNS servers, search domains, proxies, printers, and NTP servers.
 """
 
 import urllib.parse
-import socket
 
 from .. import config
 from ..logging_config import get_logger
 from ..utils import run_command
+from .detection import get_hostname
 
 # Get module logger
 logger = get_logger(__name__)
@@ -103,8 +103,10 @@ def set_proxy(service_name, url=None):
         "169.254/16",
         "localhost",
         "127.0.0.1",
-        socket.gethostname(),
     ]
+    hostname = get_hostname()
+    if hostname:
+        bypass_domains.append(hostname)
     logger.debug(f"Setting bypass domains: {bypass_domains}")
     bypass_cmd = [
         "sudo",
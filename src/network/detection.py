@@ -6,6 +6,7 @@ DNS servers, search domains, SSID, and VPN status.
 """
 
 import re
+import socket
 
 try:
     import CoreWLAN
@@ -129,6 +130,16 @@ def get_current_ssid(log_level=20):  # INFO level
     return None
 
 
+@cache_network_function("hostname")
+def get_hostname():
+    """Get the system hostname, cached for the current evaluation cycle."""
+    try:
+        return socket.gethostname() or None
+    except OSError as e:
+        logger.debug(f"Could not get hostname: {e}")
+        return None
+
+
 @cache_network_function("vpn_active")
 def is_vpn_active(log_level=20):  # INFO level
     """Check if VPN is active by examining the default route interface."""
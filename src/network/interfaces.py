@@ -23,6 +23,7 @@ from ..utils import (
     get_service_name_native,
     get_interface_ip_native,
 )
+from ..utils.native import copy_store_value
 
 # Get module logger
 logger = get_logger(__name__)
@@ -59,12 +60,9 @@ def get_primary_service_id():
         return None
 
     try:
-        store = SystemConfiguration.SCDynamicStoreCreate(None, "NetWatcher", None, None)
-        if store:
-            ipv4_key = "State:/Network/Global/IPv4"
-            ipv4_dict = SystemConfiguration.SCDynamicStoreCopyValue(store, ipv4_key)
-            if ipv4_dict:
-                return ipv4_dict.get("PrimaryService")
+        ipv4_dict = copy_store_value("State:/Network/Global/IPv4")
+        if ipv4_dict:
+            return ipv4_dict.get("PrimaryService")
     except Exception as e:
         logger.debug(f"Failed to get service ID natively: {e}")
     return None
@@ -5,27 +5,103 @@ This module handles parsing of PAC (Proxy Auto-Configuration) files
 to extract actual proxy server information for shell environments.
 """
 
-import urllib.request
-import urllib.error
+import http.client
 from typing import Optional
+from urllib.parse import urljoin, urlsplit
+from urllib.request import url2pathname
 
 from ..logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Extra URLs evaluated against the PAC alongside the caller's test URL. A PAC may
+# send one host DIRECT while proxying general traffic, so we take the first
+# proxy answer from any of them.
+PAC_PROBE_URLS = (
+    "http://www.apple.com/",
+    "http://www.google.com/",
+)
 
-def parse_pac_file_for_generic_url(
-    pac_url: str, test_url: str = "http://effinthing.com"
-) -> Optional[str]:
+PAC_DOWNLOAD_TIMEOUT = 10  # seconds
+PAC_MAX_BYTES = 1 << 20  # PAC files are small; refuse anything absurd
+PAC_MAX_REDIRECTS = 3
+
+
+def _download_pac(pac_url: str) -> str:
     """
-    Parse a PAC file and extract proxy configuration for a generic URL.
+    Download a PAC file directly, without going through any proxy.
+
+    Uses http.client rather than a urllib opener chain: a PAC fetch is a single
+    GET, so the handler dispatch of OpenerDirector is pure overhead. Like
+    curl --noproxy '*', no proxy settings are consulted. file: URLs are read
+    straight from disk.
+
+    Raises:
+        OSError or http.client.HTTPException if the file can't be fetched or
+        is larger than PAC_MAX_BYTES
+    """
+    # Only the configured URL may point at a local file; redirects may not
+    parts = urlsplit(pac_url)
+    if parts.scheme == "file":
+        with open(url2pathname(parts.path), "rb") as f:
+            return _decode_pac(f.read(PAC_MAX_BYTES + 1), pac_url)
+
+    url = pac_url
+    for _ in range(PAC_MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme == "https":
+            conn = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=PAC_DOWNLOAD_TIMEOUT)
+        elif parts.scheme == "http":
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=PAC_DOWNLOAD_TIMEOUT)
+        else:
+            raise http.client.HTTPException(f"Unsupported PAC URL scheme: {parts.scheme!r}")
+
+        try:
+            path = parts.path or "/"
+            if parts.query:
+                path = f"{path}?{parts.query}"
+            conn.request("GET", path)
+            response = conn.getresponse()
+
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader("Location")
+                if not location:
+                    raise http.client.HTTPException(f"Redirect without Location from {url}")
+                url = urljoin(url, location)
+                if urlsplit(url).scheme not in ("http", "https"):
+                    raise http.client.HTTPException(f"Refusing PAC redirect to {url}")
+                logger.debug(f"PAC download redirected to: {url}")
+                continue
+
+            if response.status != 200:
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+
+            return _decode_pac(response.read(PAC_MAX_BYTES + 1), url)
+        finally:
+            conn.close()
+
+    raise http.client.HTTPException(f"Too many redirects fetching {pac_url}")
+
+
+def _decode_pac(body: bytes, url: str) -> str:
+    """Decode a PAC body read with a PAC_MAX_BYTES + 1 limit, refusing oversized files."""
+    if len(body) > PAC_MAX_BYTES:
+        raise http.client.HTTPException(f"PAC file at {url} exceeds {PAC_MAX_BYTES} bytes")
+    return body.decode("utf-8")
+
+
+def _resolve_pac_raw(pac_url: str, test_url: str = "http://effinthing.com") -> Optional[str]:
+    """
+    Download and evaluate a PAC file, returning the raw FindProxyForURL result.
 
     Args:
         pac_url: URL to the PAC file (e.g., "http://wpad/wpad.dat")
         test_url: URL to test against the PAC file logic
 
     Returns:
-        Proxy string (e.g., "http://proxy.company.com:8080") or "DIRECT" or None
+        Raw PAC result (e.g., "PROXY proxy.company.com:8080; DIRECT"), "DIRECT",
+        or None if the PAC file could not be fetched or evaluated. Pass it to
+        extract_proxy_from_result() to get a proxy URL.
     """
     try:
         import pacparser
@@ -36,18 +112,9 @@ def parse_pac_file_for_generic_url(
         return None
 
     try:
-        # Download PAC file content
+        # Download PAC file content directly, without any proxy
         logger.debug(f"Downloading PAC file from: {pac_url}")
-
-        # Create a proxy handler that bypasses all proxies (equivalent to curl --noproxy '*')
-        # ProxyHandler({}) creates a handler with no proxy configuration, forcing direct connection
-        proxy_handler = urllib.request.ProxyHandler({})
-        opener = urllib.request.build_opener(proxy_handler)
-
-        # Use the opener to download the PAC file directly without any proxy
-        request = urllib.request.Request(pac_url)
-        with opener.open(request, timeout=10) as response:
-            pac_content = response.read().decode("utf-8")
+        pac_content = _download_pac(pac_url)
 
         if not pac_content.strip():
             logger.warning(f"Empty PAC file content from {pac_url}")
@@ -62,35 +129,23 @@ def parse_pac_file_for_generic_url(
             # Parse the PAC file content
             pacparser.parse_pac_string(pac_content)
 
-            # Find proxy for the test URL
-            proxy_result = pacparser.find_proxy(test_url, "effinthing.com")
-
-            logger.debug(f"PAC result for {test_url}: {proxy_result}")
-
-            # Parse the result - PAC files return strings like:
-            # "PROXY proxy.company.com:8080; DIRECT"
-            # "DIRECT"
-            # "PROXY proxy1.company.com:8080; PROXY proxy2.company.com:8080; DIRECT"
-
-            if not proxy_result or proxy_result == "DIRECT":
-                return "DIRECT"
-
-            # Extract first proxy from the result
-            proxies = [p.strip() for p in proxy_result.split(";")]
-            for proxy in proxies:
-                if proxy.startswith("PROXY "):
-                    proxy_server = proxy[6:].strip()  # Remove "PROXY " prefix
-                    if proxy_server:
-                        # Add http:// if not present
-                        if not proxy_server.startswith(("http://", "https://")):
-                            proxy_server = f"http://{proxy_server}"
-                        logger.debug(f"Extracted proxy: {proxy_server}")
-                        return proxy_server
-                elif proxy == "DIRECT":
-                    return "DIRECT"
-
-            # If we get here, no valid proxy was found
-            logger.warning(f"No valid proxy found in PAC result: {proxy_result}")
+            # Evaluate the test URL plus a few representative ones. pacparser is
+            # not thread-safe, so these run sequentially against the parsed PAC;
+            # each find_proxy() call is cheap once the script is loaded.
+            for url in (test_url, *PAC_PROBE_URLS):
+                # PAC files return strings like:
+                # "PROXY proxy.company.com:8080; DIRECT"
+                # "DIRECT"
+                # "PROXY proxy1.company.com:8080; PROXY proxy2.company.com:8080; DIRECT"
+                proxy_result = pacparser.find_proxy(url, urlsplit(url).hostname or "")
+                logger.debug(f"PAC result for {url}: {proxy_result}")
+
+                # Stop at the first result whose preferred entry is a proxy;
+                # "DIRECT; PROXY ..." still means DIRECT for this URL
+                if extract_proxy_from_result(proxy_result) not in (None, "DIRECT"):
+                    return proxy_result
+
+            # Every probe went DIRECT (or returned nothing usable)
             return "DIRECT"
 
         finally:
@@ -100,7 +155,7 @@ def parse_pac_file_for_generic_url(
             except Exception:
                 pass
 
-    except urllib.error.URLError:
+    except (OSError, http.client.HTTPException):
         logger.info(f"PAC file not accessible at {pac_url} (network may have changed)")
         return None
     except Exception as e:
@@ -108,6 +163,22 @@ def parse_pac_file_for_generic_url(
         return None
 
 
+def parse_pac_file_for_generic_url(
+    pac_url: str, test_url: str = "http://effinthing.com"
+) -> Optional[str]:
+    """
+    Parse a PAC file and extract proxy configuration for a generic URL.
+
+    Args:
+        pac_url: URL to the PAC file (e.g., "http://wpad/wpad.dat")
+        test_url: URL to test against the PAC file logic
+
+    Returns:
+        Proxy string (e.g., "http://proxy.company.com:8080") or "DIRECT" or None
+    """
+    return extract_proxy_from_result(_resolve_pac_raw(pac_url, test_url))
+
+
 def test_pac_parsing(pac_url: str) -> bool:
     """
     Test PAC file parsing to verify it's working correctly.
@@ -144,8 +215,11 @@ def extract_proxy_from_result(pac_result: str) -> Optional[str]:
     if not pac_result:
         return None
 
-    proxies = [p.strip() for p in pac_result.split(";")]
-    for proxy in proxies:
+    # Walk the entries one at a time and stop at the first usable one
+    remaining = pac_result
+    while remaining:
+        proxy, _, remaining = remaining.partition(";")
+        proxy = proxy.strip()
         if proxy.startswith("PROXY "):
             proxy_server = proxy[6:].strip()
             if proxy_server:
@@ -5,18 +5,107 @@ This module provides centralized proxy detection that can be used by
 multiple components (ipinfo.py, shell_proxy.py, etc.) to avoid code duplication.
 """
 
+import functools
 import re
+import subprocess
+import time
 import urllib.request
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 from ..logging_config import get_logger
-from ..utils import run_command
 from .detection import get_primary_service_interface
-from .pac_parser import parse_pac_file_for_generic_url
+from .pac_parser import _resolve_pac_raw, extract_proxy_from_result
 
 # Get module logger
 logger = get_logger(__name__)
 
+NETWORKSETUP = "/usr/sbin/networksetup"
+NETWORKSETUP_TIMEOUT = 5  # seconds
+
+# Patterns for networksetup -get*proxy output, compiled once at import
+_URL_RE = re.compile(r"URL:\s*(.+)")
+_SERVER_RE = re.compile(r"Server:\s*(.+)")
+_PORT_RE = re.compile(r"Port:\s*(\d+)")
+
+# (networksetup flag, proxy type) for manual proxies, in detection order
+_MANUAL_PROXY_QUERIES = (
+    ("-getwebproxy", "http"),
+    ("-getsecurewebproxy", "https"),
+    ("-getsocksfirewallproxy", "socks"),
+)
+
+# Every networksetup query needed for one detection pass
+_PROXY_QUERY_FLAGS = ("-getautoproxyurl",) + tuple(flag for flag, _ in _MANUAL_PROXY_QUERIES)
+
+
+def _networksetup_batch(flags: Tuple[str, ...], service: str) -> Dict[str, Optional[str]]:
+    """
+    Run several read-only networksetup queries concurrently.
+
+    All processes are spawned up front and then collected, so the probes overlap
+    instead of paying each process's latency in turn. This is the hot path of
+    proxy detection, so it bypasses run_command: the absolute path skips the
+    PATH search, stdin is not piped, and close_fds=False lets subprocess take the
+    posix_spawn fast path (our descriptors are non-inheritable by default).
+
+    Returns:
+        Dict mapping each flag to its stdout, or None if that query failed
+    """
+    procs = {}
+    for flag in flags:
+        try:
+            procs[flag] = subprocess.Popen(
+                [NETWORKSETUP, flag, service],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL,
+                close_fds=False,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+            )
+        except OSError as e:
+            logger.debug(f"networksetup {flag} failed: {e}")
+
+    results = dict.fromkeys(flags)
+    deadline = time.monotonic() + NETWORKSETUP_TIMEOUT
+    for flag, proc in procs.items():
+        try:
+            results[flag], _ = proc.communicate(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            logger.debug(f"networksetup {flag} timed out")
+            proc.kill()
+            proc.communicate()
+
+    return results
+
+
+def _parse_manual_proxy(output: Optional[str]) -> Optional[str]:
+    """Extract "server:port" from networksetup output if the proxy is enabled."""
+    if not output or "Enabled: Yes" not in output:
+        return None
+
+    server_match = _SERVER_RE.search(output)
+    port_match = _PORT_RE.search(output)
+    if not (server_match and port_match):
+        return None
+
+    return f"{server_match.group(1).strip()}:{port_match.group(1).strip()}"
+
+
+@functools.lru_cache(maxsize=16)
+def _handler_for(proxy_url: str, include_socks: bool = False) -> urllib.request.ProxyHandler:
+    """
+    Get a shared ProxyHandler that routes HTTP/HTTPS (and optionally SOCKS) via proxy_url.
+
+    The handler holds only static proxy data, so one instance per proxy URL is
+    reused across callers instead of rebuilding the dict and handler each time.
+    """
+    proxies = {"http": proxy_url, "https": proxy_url}
+    if include_socks:
+        proxies["socks"] = proxy_url
+    return urllib.request.ProxyHandler(proxies)
+
 
 def get_system_proxy_config() -> Tuple[Optional[str], Optional[str]]:
     """
@@ -28,77 +117,34 @@ def get_system_proxy_config() -> Tuple[Optional[str], Optional[str]]:
         - proxy_value: URL for PAC or host:port for manual proxy, or None
     """
     try:
-        # Get the primary service
+        # Get the primary service. This is served from the network state cache
+        # (see cache.py), which the watcher clears on every network change, so
+        # repeated proxy lookups within an evaluation don't re-run scutil.
         primary_service, _, _ = get_primary_service_interface(log_level=10)  # DEBUG
         if not primary_service:
             logger.debug("No primary service found for proxy detection")
             return None, None
 
+        # Query every proxy type at once, then check them in priority order
+        outputs = _networksetup_batch(_PROXY_QUERY_FLAGS, primary_service)
+
         # Check for PAC (auto proxy) configuration first
-        pac_output = run_command(
-            ["networksetup", "-getautoproxyurl", primary_service],
-            capture=True,
-            quiet_on_error=True,
-        )
+        pac_output = outputs["-getautoproxyurl"]
 
         if pac_output and "URL:" in pac_output:
-            url_match = re.search(r"URL:\s*(.+)", pac_output)
+            url_match = _URL_RE.search(pac_output)
             if url_match:
                 pac_url = url_match.group(1).strip()
                 if pac_url and pac_url != "(null)":
                     logger.debug(f"Found PAC proxy: {pac_url}")
                     return "pac", pac_url
 
-        # Check for manual HTTP proxy
-        http_output = run_command(
-            ["networksetup", "-getwebproxy", primary_service],
-            capture=True,
-            quiet_on_error=True,
-        )
-
-        if http_output and "Enabled: Yes" in http_output:
-            server_match = re.search(r"Server:\s*(.+)", http_output)
-            port_match = re.search(r"Port:\s*(\d+)", http_output)
-            if server_match and port_match:
-                server = server_match.group(1).strip()
-                port = port_match.group(1).strip()
-                proxy_value = f"{server}:{port}"
-                logger.debug(f"Found HTTP proxy: {proxy_value}")
-                return "http", proxy_value
-
-        # Check for manual HTTPS proxy
-        https_output = run_command(
-            ["networksetup", "-getsecurewebproxy", primary_service],
-            capture=True,
-            quiet_on_error=True,
-        )
-
-        if https_output and "Enabled: Yes" in https_output:
-            server_match = re.search(r"Server:\s*(.+)", https_output)
-            port_match = re.search(r"Port:\s*(\d+)", https_output)
-            if server_match and port_match:
-                server = server_match.group(1).strip()
-                port = port_match.group(1).strip()
-                proxy_value = f"{server}:{port}"
-                logger.debug(f"Found HTTPS proxy: {proxy_value}")
-                return "https", proxy_value
-
-        # Check for SOCKS proxy
-        socks_output = run_command(
-            ["networksetup", "-getsocksfirewallproxy", primary_service],
-            capture=True,
-            quiet_on_error=True,
-        )
-
-        if socks_output and "Enabled: Yes" in socks_output:
-            server_match = re.search(r"Server:\s*(.+)", socks_output)
-            port_match = re.search(r"Port:\s*(\d+)", socks_output)
-            if server_match and port_match:
-                server = server_match.group(1).strip()
-                port = port_match.group(1).strip()
-                proxy_value = f"{server}:{port}"
-                logger.debug(f"Found SOCKS proxy: {proxy_value}")
-                return "socks", proxy_value
+        # Check manual HTTP, HTTPS and SOCKS proxies, in that order
+        for flag, proxy_type in _MANUAL_PROXY_QUERIES:
+            proxy_value = _parse_manual_proxy(outputs[flag])
+            if proxy_value:
+                logger.debug(f"Found {proxy_type.upper()} proxy: {proxy_value}")
+                return proxy_type, proxy_value
 
         logger.debug("No system proxy configured")
         return None, None
@@ -128,14 +174,12 @@ def get_urllib_proxy_handler() -> Optional[urllib.request.ProxyHandler]:
     if proxy_type == "pac":
         # Parse PAC file to get actual proxy
         logger.debug(f"Parsing PAC file: {proxy_value}")
-        actual_proxy = parse_pac_file_for_generic_url(proxy_value)
+        actual_proxy = extract_proxy_from_result(_resolve_pac_raw(proxy_value))
 
         if actual_proxy and actual_proxy != "DIRECT":
-            # pac_parser returns URLs like "http://proxy.com:8080" already formatted
+            # extract_proxy_from_result returns URLs like "http://proxy.com:8080" already formatted
             logger.debug(f"Using proxy from PAC file: {actual_proxy}")
-            return urllib.request.ProxyHandler(
-                {"http": actual_proxy, "https": actual_proxy}
-            )
+            return _handler_for(actual_proxy)
         else:
             logger.debug("PAC file returned DIRECT, using direct connection")
             return None
@@ -144,15 +188,13 @@ def get_urllib_proxy_handler() -> Optional[urllib.request.ProxyHandler]:
         # Manual HTTP/HTTPS proxy
         proxy_url = f"http://{proxy_value}"
         logger.debug(f"Using manual {proxy_type.upper()} proxy: {proxy_url}")
-        return urllib.request.ProxyHandler({"http": proxy_url, "https": proxy_url})
+        return _handler_for(proxy_url)
 
     elif proxy_type == "socks":
         # SOCKS proxy
         proxy_url = f"socks://{proxy_value}"
         logger.debug(f"Using SOCKS proxy: {proxy_url}")
-        return urllib.request.ProxyHandler(
-            {"http": proxy_url, "https": proxy_url, "socks": proxy_url}
-        )
+        return _handler_for(proxy_url, include_socks=True)
 
     return None
 
@@ -180,10 +222,10 @@ def get_proxy_url_for_shell(resolve_pac: bool = True) -> Optional[str]:
 
         # Parse PAC file
         logger.debug(f"Parsing PAC file for shell: {proxy_value}")
-        actual_proxy = parse_pac_file_for_generic_url(proxy_value)
+        actual_proxy = extract_proxy_from_result(_resolve_pac_raw(proxy_value))
 
         if actual_proxy and actual_proxy != "DIRECT":
-            # pac_parser already returns formatted URLs like "http://proxy.com:8080"
+            # extract_proxy_from_result already returns formatted URLs like "http://proxy.com:8080"
             return actual_proxy
         else:
             return None
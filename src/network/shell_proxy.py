@@ -5,91 +5,154 @@ This module handles automatic proxy configuration for terminal applications
 by managing shell environment variables across multiple shell types.
 """
 
+import functools
+import mmap
 import os
 import pwd
-import socket
+import re
+import stat
+import tempfile
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 from ..logging_config import get_logger
 from .. import config
+from .detection import get_hostname
+from .pac_parser import parse_pac_file_for_generic_url
 
 logger = get_logger(__name__)
 
 
+# Config files that indicate a shell is in use, relative to the home directory
+_SHELL_DETECTION_FILES = {
+    "bash": (".bash_profile", ".bashrc"),
+    "zsh": (".zshrc",),
+    "tcsh": (".tcshrc",),
+    "csh": (".cshrc",),
+    "fish": (".config/fish/config.fish",),
+}
+
+# Config file NetWatcher integrates with for each shell, relative to the home directory
+_SHELL_CONFIG_FILES = {
+    "bash": ".bash_profile",
+    "zsh": ".zshrc",
+    "tcsh": ".tcshrc",
+    "csh": ".cshrc",
+    "fish": ".config/fish/config.fish",
+}
+
+
 def detect_user_shells() -> Tuple[List[str], str]:
     """
     Detect shells the user might be using.
 
+    Results are cached per home directory, since the login shell and shell
+    config files rarely change within a process lifetime.
+
     Returns:
         Tuple of (detected_shells, primary_shell)
     """
+    detected_shells, primary_name = _detect_user_shells(Path.home())
+    return list(detected_shells), primary_name
+
+
+@functools.lru_cache(maxsize=1)
+def _detect_user_shells(home: Path) -> Tuple[Tuple[str, ...], str]:
+    """Uncached shell detection for detect_user_shells()."""
     # Get primary shell from /etc/passwd
     primary_shell = pwd.getpwuid(os.getuid()).pw_shell
     primary_name = os.path.basename(primary_shell)
 
     # Check for existing shell config files
-    home = Path.home()
     detected_shells = []
 
-    shell_configs = {
-        "bash": [home / ".bash_profile", home / ".bashrc"],
-        "zsh": [home / ".zshrc"],
-        "tcsh": [home / ".tcshrc"],
-        "csh": [home / ".cshrc"],
-        "fish": [home / ".config/fish/config.fish"],
-    }
-
     # Add primary shell
-    if primary_name in shell_configs:
+    if primary_name in _SHELL_DETECTION_FILES:
         detected_shells.append(primary_name)
 
     # Check for other shells with existing config files
-    for shell, configs in shell_configs.items():
+    for shell, configs in _SHELL_DETECTION_FILES.items():
         if shell not in detected_shells:
-            if any(config.exists() for config in configs):
+            if any((home / rc_file).exists() for rc_file in configs):
                 detected_shells.append(shell)
 
-    return detected_shells, primary_name
+    return tuple(detected_shells), primary_name
 
 
 def get_bypass_domains_from_resolver_files() -> List[str]:
     """Get bypass domains from /etc/resolver files we created."""
-    resolver_dir = Path("/etc/resolver")
-    if resolver_dir.exists():
-        try:
-            return [f.name for f in resolver_dir.iterdir() if f.is_file()]
-        except PermissionError:
-            logger.debug("Cannot read /etc/resolver directory (permission denied)")
-            return []
-    return []
+    # scandir's DirEntry.is_file() uses the directory listing's d_type, so
+    # there is no per-entry stat() as with Path.iterdir() + is_file()
+    try:
+        with os.scandir("/etc/resolver") as entries:
+            return [entry.name for entry in entries if entry.is_file()]
+    except FileNotFoundError:
+        return []
+    except PermissionError:
+        logger.debug("Cannot read /etc/resolver directory (permission denied)")
+        return []
+
+
+_STANDARD_BYPASS_DOMAINS = (
+    "localhost",
+    "127.0.0.1",
+    "*.local",
+    "169.254/16",  # Link-local
+)
 
 
 def get_standard_bypass_domains() -> List[str]:
     """Get standard bypass domains for shell proxy."""
-    standard = [
-        "localhost",
-        "127.0.0.1",
-        "*.local",
-        "169.254/16",  # Link-local
-    ]
+    standard = list(_STANDARD_BYPASS_DOMAINS)
 
-    try:
-        hostname = socket.gethostname()
-        if hostname:
-            standard.append(hostname)
-    except Exception:
-        pass
+    hostname = get_hostname()
+    if hostname:
+        standard.append(hostname)
 
     return standard
 
 
+def _get_shell_bypass_list() -> List[str]:
+    """Get complete bypass domain list for shell proxy, as a list."""
+    return get_standard_bypass_domains() + get_bypass_domains_from_resolver_files()
+
+
 def get_shell_bypass_domains() -> str:
     """Get complete bypass domain list for shell proxy."""
-    standard = get_standard_bypass_domains()
-    resolver_domains = get_bypass_domains_from_resolver_files()
-    all_bypasses = standard + resolver_domains
-    return ",".join(all_bypasses)
+    return ",".join(_get_shell_bypass_list())
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_proxy_endpoint(proxy_url: str) -> Tuple[str, str]:
+    """
+    Normalize a proxy URL and derive the host:port form used for rsync_proxy.
+
+    Only depends on the URL string, so results are cached; the rest of
+    parse_proxy_config (PAC evaluation, bypass list) depends on network state.
+
+    Returns:
+        Tuple of (proxy_url with scheme, rsync_proxy)
+    """
+    if "://" not in proxy_url:
+        proxy_url = f"http://{proxy_url}"
+
+    # Extract host and port for rsync_proxy
+    try:
+        parsed = urlparse(proxy_url)
+        if parsed.hostname and parsed.port:
+            rsync_proxy = f"{parsed.hostname}:{parsed.port}"
+        elif parsed.hostname:
+            # Default to port 80 if not specified
+            rsync_proxy = f"{parsed.hostname}:80"
+        else:
+            # Fallback: strip protocol
+            rsync_proxy = proxy_url.replace("http://", "").replace("https://", "")
+    except Exception:
+        # Fallback: strip protocol
+        rsync_proxy = proxy_url.replace("http://", "").replace("https://", "")
+
+    return proxy_url, rsync_proxy
 
 
 def parse_proxy_config(
@@ -111,8 +174,6 @@ def parse_proxy_config(
     if proxy_url.endswith((".pac", ".dat")):
         # PAC/WPAD file - parse it to get actual proxy
         logger.debug(f"Parsing PAC file: {proxy_url}")
-        from .pac_parser import parse_pac_file_for_generic_url
-
         actual_proxy = parse_pac_file_for_generic_url(proxy_url)
         if actual_proxy and actual_proxy != "DIRECT":
             proxy_url = actual_proxy
@@ -120,37 +181,17 @@ def parse_proxy_config(
             logger.debug("PAC file returned DIRECT or failed to parse")
             return None
 
-    # Parse proxy URL
-    if "://" not in proxy_url:
-        proxy_url = f"http://{proxy_url}"
-
-    # Extract host and port for rsync_proxy
-    try:
-        from urllib.parse import urlparse
-
-        parsed = urlparse(proxy_url)
-        if parsed.hostname and parsed.port:
-            rsync_proxy = f"{parsed.hostname}:{parsed.port}"
-        elif parsed.hostname:
-            # Default to port 80 if not specified
-            rsync_proxy = f"{parsed.hostname}:80"
-        else:
-            # Fallback: strip protocol
-            rsync_proxy = proxy_url.replace("http://", "").replace("https://", "")
-    except Exception:
-        # Fallback: strip protocol
-        rsync_proxy = proxy_url.replace("http://", "").replace("https://", "")
+    proxy_url, rsync_proxy = _parse_proxy_endpoint(proxy_url)
 
-    # Build bypass domains list
-    standard_bypasses = get_shell_bypass_domains().split(",")
-    all_bypasses = standard_bypasses.copy()
+    # Build bypass domains list (dict keys: ordered, with O(1) membership checks)
+    all_bypasses = dict.fromkeys(_get_shell_bypass_list())
 
     # Add additional bypass domains (e.g., DNS search domains from location config)
     if additional_bypass_domains:
         added_domains = []
         for domain in additional_bypass_domains:
             if domain and domain not in all_bypasses:
-                all_bypasses.append(domain)
+                all_bypasses[domain] = None
                 added_domains.append(domain)
         if added_domains:
             logger.debug(f"Added DNS search domains to no_proxy: {added_domains}")
@@ -167,190 +208,307 @@ def parse_proxy_config(
     }
 
 
-def write_bash_proxy_env(proxy_config: Optional[Dict[str, str]]):
-    """Write bash/zsh compatible proxy environment file."""
-    cache_file = Path.home() / ".config/netwatcher/proxy.env.sh"
-    cache_file.parent.mkdir(parents=True, exist_ok=True)
+_PROXY_ENV_HEADER = (
+    "# Generated by NetWatcher - Auto-generated, will be overwritten\n"
+    "# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml\n"
+)
+
+# Sections of a proxy env file: (comment, ((variable name, proxy_config key), ...))
+_SH_ENV_SECTIONS = (
+    (
+        "Standard proxy variables",
+        (
+            ("http_proxy", "http_proxy"),
+            ("https_proxy", "https_proxy"),
+            ("ftp_proxy", "ftp_proxy"),
+            ("all_proxy", "all_proxy"),
+        ),
+    ),
+    ("Special case: rsync (no protocol)", (("rsync_proxy", "rsync_proxy"),)),
+    ("Bypass addresses", (("no_proxy", "no_proxy"),)),
+)
+
+# tcsh/csh and fish also export the legacy uppercase variants
+_UPPERCASE_ENV_SECTIONS = (
+    _SH_ENV_SECTIONS[0],
+    (
+        "Legacy uppercase versions",
+        (
+            ("HTTP_PROXY", "http_proxy"),
+            ("HTTPS_PROXY", "https_proxy"),
+            ("FTP_PROXY", "ftp_proxy"),
+            ("ALL_PROXY", "all_proxy"),
+        ),
+    ),
+    _SH_ENV_SECTIONS[1],
+    ("Bypass addresses", (("no_proxy", "no_proxy"), ("NO_PROXY", "no_proxy"))),
+)
+
+
+def _build_env_template(line_format: str, sections) -> str:
+    """Build a str.format_map template with one {proxy_config key} placeholder per variable."""
+    parts = [_PROXY_ENV_HEADER]
+    for comment, variables in sections:
+        parts.append(f"\n# {comment}\n")
+        parts.extend(line_format.format(name=name, value=f"{{{key}}}") for name, key in variables)
+    return "".join(parts)
+
+
+# Shell kind -> (file name, description, content template)
+_SHELL_ENV_FORMATS = {
+    "sh": ("proxy.env.sh", "bash/zsh", _build_env_template('export {name}="{value}"\n', _SH_ENV_SECTIONS)),
+    "csh": ("proxy.env.csh", "tcsh/csh", _build_env_template('setenv {name} "{value}"\n', _UPPERCASE_ENV_SECTIONS)),
+    "fish": ("proxy.env.fish", "fish", _build_env_template('set -x {name} "{value}"\n', _UPPERCASE_ENV_SECTIONS)),
+}
+
+
+def _proxy_env_dir() -> Path:
+    """Directory holding the generated shell proxy env files."""
+    return Path.home() / ".config/netwatcher"
+
+
+def _write_synced(fd: int, data: bytes) -> None:
+    """
+    Write data to an open descriptor, fsync it and close it.
 
-    if proxy_config:
-        content = f"""# Generated by NetWatcher - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
+    The rendered file is already a single bytes object, so it goes straight to
+    os.write() with no buffered file object in between.
+    """
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
-# Standard proxy variables
-export http_proxy="{proxy_config["http_proxy"]}"
-export https_proxy="{proxy_config["https_proxy"]}"
-export ftp_proxy="{proxy_config["ftp_proxy"]}"
-export all_proxy="{proxy_config["all_proxy"]}"
 
-# Special case: rsync (no protocol)
-export rsync_proxy="{proxy_config["rsync_proxy"]}"
+def _write_env_file(path: Path, content: str) -> bool:
+    """
+    Write a proxy env file, fsyncing its data (the caller fsyncs the directory).
 
-# Bypass addresses
-export no_proxy="{proxy_config["no_proxy"]}"
-"""
-        # Write atomically
-        temp_file = cache_file.with_suffix(".tmp")
-        with open(temp_file, "w") as f:
-            f.write(content)
-        temp_file.rename(cache_file)
-
-        logger.debug(f"Updated bash/zsh proxy environment: {cache_file}")
-    else:
-        # No proxy needed - delete the file
-        if cache_file.exists():
-            cache_file.unlink()
-            logger.debug(f"Removed bash/zsh proxy environment file: {cache_file}")
+    Nothing is written if the file already has exactly this content, which is
+    the common case on every network event of a stable network. A file that
+    doesn't exist yet is created with O_EXCL and written in place, which skips
+    the temp file and rename; like open(), it gets 0666 less the umask. Existing
+    files are replaced atomically through a unique temp file so shells never
+    source a half-written file.
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    data = content.encode("utf-8")
+
+    try:
+        # The env files are a few hundred bytes: a byte compare beats hashing
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            pass  # Created concurrently - fall through to the atomic replace
         else:
-            logger.debug("No bash/zsh proxy environment file to remove")
+            _write_synced(fd, data)
+            return True
 
+    # mkstemp gives each writer its own O_EXCL, 0600 temp file in the target
+    # directory, so overlapping updates can't clobber each other's temp file
+    # and the rename stays on one filesystem. The replacement keeps the mode
+    # of the file it replaces, as an in-place rewrite would.
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        try:
+            os.fchmod(fd, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass  # Removed concurrently; keep mkstemp's mode
+        _write_synced(fd, data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return True
 
-def write_csh_proxy_env(proxy_config: Optional[Dict[str, str]]):
-    """Write tcsh/csh compatible proxy environment file."""
-    cache_file = Path.home() / ".config/netwatcher/proxy.env.csh"
-    cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+def _fsync_directory(directory: Path) -> None:
+    """Flush directory entries (creates, renames, unlinks) to disk."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Could not fsync {directory}: {e}")
+
+
+def _apply_proxy_env(shell_kind: str, proxy_config: Optional[Dict[str, str]], env_dir: Path) -> bool:
+    """
+    Write or remove one shell's proxy env file without syncing the directory.
+
+    The caller resolves env_dir once and makes sure it exists, so a batch of
+    writes doesn't repeat the home lookup and mkdir per file.
+
+    Returns:
+        True if the file was changed on disk
+    """
+    file_name, description, template = _SHELL_ENV_FORMATS[shell_kind]
+    cache_file = env_dir / file_name
 
     if proxy_config:
-        content = f"""# Generated by NetWatcher - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
+        if _write_env_file(cache_file, template.format_map(proxy_config)):
+            logger.debug(f"Updated {description} proxy environment: {cache_file}")
+            return True
 
-# Standard proxy variables
-setenv http_proxy "{proxy_config["http_proxy"]}"
-setenv https_proxy "{proxy_config["https_proxy"]}"
-setenv ftp_proxy "{proxy_config["ftp_proxy"]}"
-setenv all_proxy "{proxy_config["all_proxy"]}"
+        logger.debug(f"{description} proxy environment already up to date: {cache_file}")
+        return False
 
-# Legacy uppercase versions
-setenv HTTP_PROXY "{proxy_config["http_proxy"]}"
-setenv HTTPS_PROXY "{proxy_config["https_proxy"]}"
-setenv FTP_PROXY "{proxy_config["ftp_proxy"]}"
-setenv ALL_PROXY "{proxy_config["all_proxy"]}"
+    # No proxy needed - delete the file
+    if cache_file.exists():
+        cache_file.unlink()
+        logger.debug(f"Removed {description} proxy environment file: {cache_file}")
+        return True
 
-# Special case: rsync (no protocol)
-setenv rsync_proxy "{proxy_config["rsync_proxy"]}"
+    logger.debug(f"No {description} proxy environment file to remove")
+    return False
 
-# Bypass addresses
-setenv no_proxy "{proxy_config["no_proxy"]}"
-setenv NO_PROXY "{proxy_config["no_proxy"]}"
-"""
-        # Write atomically
-        temp_file = cache_file.with_suffix(".tmp")
-        with open(temp_file, "w") as f:
-            f.write(content)
-        temp_file.rename(cache_file)
-
-        logger.debug(f"Updated tcsh/csh proxy environment: {cache_file}")
-    else:
-        # No proxy needed - delete the file
-        if cache_file.exists():
-            cache_file.unlink()
-            logger.debug(f"Removed tcsh/csh proxy environment file: {cache_file}")
-        else:
-            logger.debug("No tcsh/csh proxy environment file to remove")
 
+def write_proxy_env(shell_kind: str, proxy_config: Optional[Dict[str, str]]):
+    """
+    Write the proxy environment file for one shell family.
 
-def write_fish_proxy_env(proxy_config: Optional[Dict[str, str]]):
-    """Write fish shell compatible proxy environment file."""
-    cache_file = Path.home() / ".config/netwatcher/proxy.env.fish"
-    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    Args:
+        shell_kind: Key into _SHELL_ENV_FORMATS ("sh", "csh" or "fish")
+        proxy_config: Proxy configuration from parse_proxy_config(), or None to
+                      remove the file
+    """
+    env_dir = _proxy_env_dir()
+    env_dir.mkdir(parents=True, exist_ok=True)
+    if _apply_proxy_env(shell_kind, proxy_config, env_dir):
+        _fsync_directory(env_dir)
 
-    if proxy_config:
-        content = f"""# Generated by NetWatcher - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
 
-# Standard proxy variables
-set -x http_proxy "{proxy_config["http_proxy"]}"
-set -x https_proxy "{proxy_config["https_proxy"]}"
-set -x ftp_proxy "{proxy_config["ftp_proxy"]}"
-set -x all_proxy "{proxy_config["all_proxy"]}"
+def write_bash_proxy_env(proxy_config: Optional[Dict[str, str]]):
+    """Write bash/zsh compatible proxy environment file."""
+    write_proxy_env("sh", proxy_config)
 
-# Legacy uppercase versions
-set -x HTTP_PROXY "{proxy_config["http_proxy"]}"
-set -x HTTPS_PROXY "{proxy_config["https_proxy"]}"
-set -x FTP_PROXY "{proxy_config["ftp_proxy"]}"
-set -x ALL_PROXY "{proxy_config["all_proxy"]}"
 
-# Special case: rsync (no protocol)
-set -x rsync_proxy "{proxy_config["rsync_proxy"]}"
+def write_csh_proxy_env(proxy_config: Optional[Dict[str, str]]):
+    """Write tcsh/csh compatible proxy environment file."""
+    write_proxy_env("csh", proxy_config)
 
-# Bypass addresses
-set -x no_proxy "{proxy_config["no_proxy"]}"
-set -x NO_PROXY "{proxy_config["no_proxy"]}"
-"""
-        # Write atomically
-        temp_file = cache_file.with_suffix(".tmp")
-        with open(temp_file, "w") as f:
-            f.write(content)
-        temp_file.rename(cache_file)
-
-        logger.debug(f"Updated fish proxy environment: {cache_file}")
-    else:
-        # No proxy needed - delete the file
-        if cache_file.exists():
-            cache_file.unlink()
-            logger.debug(f"Removed fish proxy environment file: {cache_file}")
-        else:
-            logger.debug("No fish proxy environment file to remove")
+
+def write_fish_proxy_env(proxy_config: Optional[Dict[str, str]]):
+    """Write fish shell compatible proxy environment file."""
+    write_proxy_env("fish", proxy_config)
 
 
 def write_all_shell_proxy_files(proxy_config: Optional[Dict[str, str]]):
     """Write proxy environment files for all supported shells."""
-    write_bash_proxy_env(proxy_config)
-    write_csh_proxy_env(proxy_config)
-    write_fish_proxy_env(proxy_config)
+    env_dir = _proxy_env_dir()
+    env_dir.mkdir(parents=True, exist_ok=True)
 
+    changed = False
+    for shell_kind in _SHELL_ENV_FORMATS:
+        changed |= _apply_proxy_env(shell_kind, proxy_config, env_dir)
 
-def get_shell_config_file(shell_name: str) -> Optional[Path]:
-    """Get the appropriate shell config file for a given shell."""
-    home = Path.home()
-
-    shell_configs = {
-        "bash": home / ".bash_profile",
-        "zsh": home / ".zshrc",
-        "tcsh": home / ".tcshrc",
-        "csh": home / ".cshrc",
-        "fish": home / ".config/fish/config.fish",
-    }
+    # One directory fsync covers every create/rename/unlink above
+    if changed:
+        _fsync_directory(env_dir)
 
-    return shell_configs.get(shell_name)
 
+def get_shell_config_file(shell_name: str) -> Optional[Path]:
+    """Get the appropriate shell config file for a given shell."""
+    config_file = _SHELL_CONFIG_FILES.get(shell_name)
+    return Path.home() / config_file if config_file else None
 
-def get_shell_integration_block(shell_name: str) -> Optional[str]:
-    """Get the integration block for a specific shell."""
 
-    integrations = {
-        "bash": """# NetWatcher proxy configuration - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
-if [[ -f ~/.config/netwatcher/proxy.env.sh ]]; then
-    source ~/.config/netwatcher/proxy.env.sh
-fi
-# End NetWatcher proxy configuration""",
-        "zsh": """# NetWatcher proxy configuration - Auto-generated, will be overwritten
+_INTEGRATION_HEADER = """# NetWatcher proxy configuration - Auto-generated, will be overwritten
 # To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
-if [[ -f ~/.config/netwatcher/proxy.env.sh ]]; then
+"""
+_INTEGRATION_FOOTER = "# End NetWatcher proxy configuration"
+
+_SH_INTEGRATION = (
+    _INTEGRATION_HEADER
+    + """if [[ -f ~/.config/netwatcher/proxy.env.sh ]]; then
     source ~/.config/netwatcher/proxy.env.sh
 fi
-# End NetWatcher proxy configuration""",
-        "tcsh": """# NetWatcher proxy configuration - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
-if (-f ~/.config/netwatcher/proxy.env.csh) then
-    source ~/.config/netwatcher/proxy.env.csh
-endif
-# End NetWatcher proxy configuration""",
-        "csh": """# NetWatcher proxy configuration - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
-if (-f ~/.config/netwatcher/proxy.env.csh) then
+"""
+    + _INTEGRATION_FOOTER
+)
+_CSH_INTEGRATION = (
+    _INTEGRATION_HEADER
+    + """if (-f ~/.config/netwatcher/proxy.env.csh) then
     source ~/.config/netwatcher/proxy.env.csh
 endif
-# End NetWatcher proxy configuration""",
-        "fish": """# NetWatcher proxy configuration - Auto-generated, will be overwritten
-# To disable: set shell_proxy_enabled = false in ~/.config/netwatcher/config.toml
-if test -f ~/.config/netwatcher/proxy.env.fish
+"""
+    + _INTEGRATION_FOOTER
+)
+_FISH_INTEGRATION = (
+    _INTEGRATION_HEADER
+    + """if test -f ~/.config/netwatcher/proxy.env.fish
     source ~/.config/netwatcher/proxy.env.fish
 end
-# End NetWatcher proxy configuration""",
-    }
+"""
+    + _INTEGRATION_FOOTER
+)
+
+# Integration block per shell, built once at import
+_SHELL_INTEGRATIONS = {
+    "bash": _SH_INTEGRATION,
+    "zsh": _SH_INTEGRATION,
+    "tcsh": _CSH_INTEGRATION,
+    "csh": _CSH_INTEGRATION,
+    "fish": _FISH_INTEGRATION,
+}
+
+# Exact bytes appended to an rc file, pre-encoded for the append path
+_INTEGRATION_APPEND_BYTES = {shell: f"\n{block}\n".encode("utf-8") for shell, block in _SHELL_INTEGRATIONS.items()}
+
+# Written to a fresh ~/.bash_profile so login shells still read ~/.bashrc
+_BASH_PROFILE_BOOTSTRAP = b"""# Created by NetWatcher
+# Source .bashrc for interactive shells
+if [[ "${-}" =~ i ]] && [[ -f ~/.bashrc ]]; then
+    source ~/.bashrc
+fi
+
+"""
+
+
+def get_shell_integration_block(shell_name: str) -> Optional[str]:
+    """Get the integration block for a specific shell."""
+    return _SHELL_INTEGRATIONS.get(shell_name)
 
-    return integrations.get(shell_name)
+
+# Matches a whole integration block as appended by setup_shell_integration()
+_INTEGRATION_BLOCK_RE = re.compile(
+    r"\n?^# NetWatcher proxy configuration.*?^# End NetWatcher proxy configuration[^\n]*\n?",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+_INTEGRATION_MARKER = b"NetWatcher proxy configuration"
+
+
+def _has_integration_block(config_file: Path) -> bool:
+    """
+    Check whether a shell config file already contains the integration block.
+
+    Searches the memory-mapped bytes rather than reading and decoding the file.
+    The whole file is searched, not just the tail, since other installers
+    commonly append to rc files after our block.
+    """
+    try:
+        with open(config_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False  # mmap can't map an empty file
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped.find(_INTEGRATION_MARKER) != -1
+    except FileNotFoundError:
+        return False
 
 
 def setup_shell_integration(shell_name: str) -> bool:
@@ -368,16 +526,8 @@ def setup_shell_integration(shell_name: str) -> bool:
     # For bash, create .bash_profile if it doesn't exist
     if shell_name == "bash" and not config_file.exists():
         config_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(config_file, "w") as f:
-            f.write(
-                """# Created by NetWatcher
-# Source .bashrc for interactive shells
-if [[ "${-}" =~ i ]] && [[ -f ~/.bashrc ]]; then
-    source ~/.bashrc
-fi
-
-"""
-            )
+        with open(config_file, "wb") as f:
+            f.write(_BASH_PROFILE_BOOTSTRAP)
         logger.info(f"Created {config_file}")
 
     # For fish, create config directory if it doesn't exist
@@ -385,15 +535,14 @@ fi
         config_file.parent.mkdir(parents=True, exist_ok=True)
 
     # Check if already integrated
-    content = config_file.read_text() if config_file.exists() else ""
-    if "NetWatcher proxy configuration" in content:
+    if _has_integration_block(config_file):
         logger.debug(f"Shell proxy integration already present in {config_file}")
         return True
 
     # Add integration block
     try:
-        with open(config_file, "a") as f:
-            f.write(f"\n{integration_block}\n")
+        with open(config_file, "ab") as f:
+            f.write(_INTEGRATION_APPEND_BYTES[shell_name])
         logger.info(f"Added NetWatcher proxy integration to {config_file}")
         return True
     except Exception as e:
@@ -404,28 +553,21 @@ fi
 def remove_shell_integration(shell_name: str) -> bool:
     """Remove NetWatcher proxy integration from a specific shell."""
     config_file = get_shell_config_file(shell_name)
-    if not config_file or not config_file.exists():
+    if not config_file:
         return True
 
     try:
         content = config_file.read_text()
+    except FileNotFoundError:
+        return True
 
-        # Remove NetWatcher block
-        lines = content.splitlines()
-        filtered_lines = []
-        skip_block = False
-
-        for line in lines:
-            if "NetWatcher proxy configuration" in line:
-                skip_block = True
-            elif "End NetWatcher proxy configuration" in line:
-                skip_block = False
-                continue
-            elif not skip_block:
-                filtered_lines.append(line)
-
-        if len(filtered_lines) != len(lines):
-            config_file.write_text("\n".join(filtered_lines) + "\n")
+    try:
+
+        # Remove NetWatcher block (and the blank line we added before it)
+        new_content = _INTEGRATION_BLOCK_RE.sub("", content)
+
+        if new_content != content:
+            config_file.write_text(new_content)
             logger.info(f"Removed NetWatcher proxy integration from {config_file}")
 
         return True
@@ -434,59 +576,73 @@ def remove_shell_integration(shell_name: str) -> bool:
         return False
 
 
+_SETTINGS_HEADER_RE = re.compile(r"^[ \t]*\[[ \t]*settings[ \t]*\][ \t]*(?:#[^\n]*)?$", re.MULTILINE)
+
+
+def _shell_proxy_enabled_in(content: str) -> bool:
+    """Check that config.toml text parses and has settings.shell_proxy_enabled = true."""
+    import toml
+
+    try:
+        settings = toml.loads(content).get("settings")
+    except toml.TomlDecodeError:
+        return False
+    return isinstance(settings, dict) and settings.get("shell_proxy_enabled") is True
+
+
 def ensure_shell_proxy_config():
     """Ensure shell proxy configuration options exist in config.toml."""
     config_path = config.get_config_path()
 
-    if not config_path.exists():
+    try:
+        content = config_path.read_text()
+    except FileNotFoundError:
         logger.warning("Config file doesn't exist - run 'netwatcher configure' first")
         return False
 
     try:
         import toml
 
-        # Read current config
-        with open(config_path, "r") as f:
-            config_data = toml.load(f)
-
-        # Ensure [settings] section exists
-        if "settings" not in config_data:
-            config_data["settings"] = {}
-
-        settings_changed = False
-
-        # Add shell_proxy_enabled if missing
-        if "shell_proxy_enabled" not in config_data["settings"]:
-            config_data["settings"]["shell_proxy_enabled"] = True
-            settings_changed = True
+        config_data = toml.loads(content)
+        settings = config_data.get("settings", {})
+        if not isinstance(settings, dict):
+            logger.warning("config.toml 'settings' is not a table; not adding shell_proxy_enabled")
+            return False
+
+        # Add shell_proxy_enabled if missing. This is a targeted text edit rather
+        # than a toml.dump() of the whole file, which would also drop the user's
+        # comments and formatting.
+        if "shell_proxy_enabled" not in settings:
+            new_content = None
+            if "settings" not in config_data:
+                new_content = content
+                if new_content and not new_content.endswith("\n"):
+                    new_content += "\n"
+                new_content += "\n[settings]\nshell_proxy_enabled = true\n"
+            else:
+                header = _SETTINGS_HEADER_RE.search(content)
+                if header:
+                    insert_at = header.end()
+                    new_content = f"{content[:insert_at]}\nshell_proxy_enabled = true{content[insert_at:]}"
+
+            # The table exists but has no plain header (dotted keys, inline table,
+            # or a header the pattern missed) or the edit didn't take: round-trip
+            # the parsed config rather than risk a second [settings] table
+            if new_content is None or not _shell_proxy_enabled_in(new_content):
+                logger.warning("Could not edit [settings] in place; rewriting config.toml without comments")
+                config_data.setdefault("settings", {})["shell_proxy_enabled"] = True
+                new_content = toml.dumps(config_data)
+
+            config_path.write_text(new_content)
             logger.info("Added shell_proxy_enabled = true to config")
-            logger.debug(
-                f"DEBUG: shell_proxy_enabled value type: {type(config_data['settings']['shell_proxy_enabled'])}"
-            )
-            logger.debug(
-                f"DEBUG: shell_proxy_enabled value: {repr(config_data['settings']['shell_proxy_enabled'])}"
-            )
+            logger.info(f"Updated configuration file: {config_path}")
 
         # Add shell_proxy_shells if missing (commented example)
-        if "shell_proxy_shells" not in config_data["settings"]:
-            # We can't add comments with toml library, but we can note it in logs
+        if "shell_proxy_shells" not in settings:
             logger.info(
                 'Note: You can optionally add shell_proxy_shells = ["bash", "zsh"] to limit which shells are configured'
             )
 
-        # Write back if changed
-        if settings_changed:
-            with open(config_path, "w") as f:
-                toml.dump(config_data, f)
-            logger.info(f"Updated configuration file: {config_path}")
-
-            # DEBUG: Read back the file to verify what was written
-            with open(config_path, "r") as f:
-                verification_data = toml.load(f)
-            logger.debug(
-                f"DEBUG: Verification - shell_proxy_enabled after write: {verification_data.get('settings', {}).get('shell_proxy_enabled', 'NOT_FOUND')}"
-            )
-
         return True
 
     except Exception as e:
@@ -582,20 +738,29 @@ def remove_all_shell_integrations():
             logger.warning(f"Failed to remove {shell} integration: {e}")
 
 
+# Inputs of the last successful update_shell_proxy_configuration() call
+_last_shell_proxy_state = None
+
+
 def cleanup_shell_proxy_files():
     """Remove all shell proxy environment files."""
-    cache_dir = Path.home() / ".config/netwatcher"
-    proxy_files = [
-        cache_dir / "proxy.env.sh",
-        cache_dir / "proxy.env.csh",
-        cache_dir / "proxy.env.fish",
-    ]
+    global _last_shell_proxy_state
+    _last_shell_proxy_state = None  # Files are gone; the next update must rewrite them
+
+    # One directory scan finds whatever env files (and stray temp files) exist,
+    # instead of a stat() per expected file name
+    try:
+        with os.scandir(_proxy_env_dir()) as entries:
+            proxy_files = [entry.path for entry in entries if entry.name.startswith("proxy.env.")]
+    except FileNotFoundError:
+        return
 
     for proxy_file in proxy_files:
         try:
-            if proxy_file.exists():
-                proxy_file.unlink()
-                logger.debug(f"Removed proxy file: {proxy_file}")
+            os.unlink(proxy_file)
+            logger.debug(f"Removed proxy file: {proxy_file}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
             logger.warning(f"Failed to remove {proxy_file}: {e}")
 
@@ -604,9 +769,22 @@ def update_shell_proxy_configuration(
     proxy_url: str, dns_search_domains: Optional[List[str]] = None
 ):
     """Update shell proxy configuration based on proxy URL and DNS search domains."""
+    global _last_shell_proxy_state
+
+    # Skip the whole parse/write pass when nothing it depends on has changed.
+    # PAC results depend on the network we're on, so those are always re-evaluated.
+    is_pac = bool(proxy_url) and proxy_url.endswith((".pac", ".dat"))
+    state = None
+    if not is_pac:
+        state = (proxy_url, tuple(dns_search_domains or ()), tuple(_get_shell_bypass_list()))
+        if state == _last_shell_proxy_state:
+            logger.debug("Shell proxy configuration unchanged, skipping update")
+            return
+
     try:
         proxy_config = parse_proxy_config(proxy_url, dns_search_domains)
         write_all_shell_proxy_files(proxy_config)
+        _last_shell_proxy_state = state
 
         if proxy_config:
             logger.info(
@@ -37,10 +37,15 @@ def run_command(command, capture=False, text=True, input=None, shell=False, quie
     logger.debug(f"Running command ({'shell' if shell else 'list'}): {command}")
 
     try:
+        # close_fds=False lets subprocess use posix_spawn instead of fork+exec.
+        # Our own descriptors are non-inheritable by default (PEP 446), so
+        # nothing leaks into the child. Before Python 3.13 the fast path also
+        # needs the program given as an absolute path.
         result = subprocess.run(
             command,
             shell=shell,
             check=False,
+            close_fds=False,
             capture_output=True,
             text=text,
             encoding="utf-8",
@@ -6,8 +6,16 @@ and socket operations for network information gathering.
 It serves as the central location for all native API calls to avoid duplication.
 """
 
+import ctypes
+import ctypes.util
+import functools
+import os
 import re
+import socket
 import subprocess
+import sys
+import threading
+import time
 
 try:
     import SystemConfiguration
@@ -24,6 +32,42 @@ try:
 except ImportError:
     netifaces = None
 
+IFCONFIG = "/sbin/ifconfig"  # absolute: the fallback runs with a minimal environment
+IFCONFIG_TIMEOUT = 1.0  # seconds
+
+# IPv4 address line in ifconfig output
+_INET_RE = re.compile(r"inet (\d+\.\d+\.\d+\.\d+)")
+
+# Shared SCDynamicStore session, created on first use (or registered by the watcher)
+_store = None
+_store_lock = threading.Lock()
+
+
+def set_dynamic_store(store):
+    """
+    Register an existing SCDynamicStore session for the native helpers to reuse.
+
+    The watcher already holds a long-lived store for change notifications;
+    sharing it avoids creating a second session for reads.
+    """
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def _get_dynamic_store():
+    """Get the shared SCDynamicStore session, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SystemConfiguration.SCDynamicStoreCreate(None, "NetWatcher", None, None)
+    return _store
+
+
+_GLOBAL_DNS_KEY = "State:/Network/Global/DNS"
+_SERVICE_DNS_PATTERN = "State:/Network/Service/.*/DNS"
+
 
 def get_dns_info_native():
     """
@@ -41,22 +85,25 @@ def get_dns_info_native():
         return None
 
     try:
-        store = SystemConfiguration.SCDynamicStoreCreate(None, "NetWatcher", None, None)
+        store = _get_dynamic_store()
         if not store:
             return None
 
-        # Get all DNS service keys
-        dns_pattern = "State:/Network/Service/.*/DNS"
-        dns_keys = SystemConfiguration.SCDynamicStoreCopyKeyList(store, dns_pattern)
+        # Fetch every service's DNS entity plus the global one in a single
+        # round trip to configd, rather than a key listing and a read per key
+        values = SystemConfiguration.SCDynamicStoreCopyMultiple(store, [_GLOBAL_DNS_KEY], [_SERVICE_DNS_PATTERN])
+        if not values:
+            return None
 
+        dns_keys = sorted(key for key in values if key != _GLOBAL_DNS_KEY)
         if not dns_keys:
             logger.debug("No DNS service keys found, checking global DNS")
-            return _get_global_dns_info(store)
+            return _get_global_dns_info(values.get(_GLOBAL_DNS_KEY))
 
         # Process each DNS service
         result = []
         for dns_key in dns_keys:
-            dns_dict = SystemConfiguration.SCDynamicStoreCopyValue(store, dns_key)
+            dns_dict = values[dns_key]
             if dns_dict:
                 resolver_info = _format_dns_resolver_info(dns_dict, dns_key, len(result) + 1)
                 if resolver_info:
@@ -69,12 +116,9 @@ def get_dns_info_native():
         return None
 
 
-def _get_global_dns_info(store):
-    """Get global DNS configuration as fallback."""
+def _get_global_dns_info(global_dns_dict):
+    """Format the global DNS configuration as a fallback."""
     try:
-        global_dns_key = "State:/Network/Global/DNS"
-        global_dns_dict = SystemConfiguration.SCDynamicStoreCopyValue(store, global_dns_key)
-
         if not global_dns_dict:
             return None
 
@@ -85,8 +129,7 @@ def _get_global_dns_info(store):
             return None
 
         result = ["resolver #1"]
-        for i, server in enumerate(dns_servers):
-            result.append(f"  nameserver[{i}] : {server}")
+        result += [f"  nameserver[{i}] : {server}" for i, server in enumerate(dns_servers)]
         if search_domains:
             result.append(f"  search domain[0] : {' '.join(search_domains)}")
 
@@ -110,8 +153,7 @@ def _format_dns_resolver_info(dns_dict, dns_key, resolver_num):
     if interface != "unknown":
         result.append(f"  interface: {interface}")
 
-    for i, server in enumerate(dns_servers):
-        result.append(f"  nameserver[{i}] : {server}")
+    result += [f"  nameserver[{i}] : {server}" for i, server in enumerate(dns_servers)]
 
     if search_domains:
         result.append(f"  search domain[0] : {' '.join(search_domains)}")
@@ -119,14 +161,88 @@ def _format_dns_resolver_info(dns_dict, dns_key, resolver_num):
     return result
 
 
+_GLOBAL_IPV4_KEY = "State:/Network/Global/IPv4"
+_INTERFACE_IPV4_PATTERN = "State:/Network/Interface/.*/IPv4"
+
+# Keys a snapshot always covers; present in it unless unset in the store
+_SNAPSHOT_KEYS = (_GLOBAL_IPV4_KEY, _GLOBAL_DNS_KEY)
+
+
+def get_network_state_snapshot():
+    """
+    Snapshot the dynamic store entities that describe the current network.
+
+    Covers the keys the watcher is notified about (global and per-interface
+    IPv4) plus global DNS, fetched in one SCDynamicStoreCopyMultiple call.
+    Two snapshots compare equal when none of those entities changed.
+
+    Returns:
+        Dictionary of store key to value, or None if unavailable
+    """
+    if not SystemConfiguration:
+        return None
+
+    try:
+        store = _get_dynamic_store()
+        if not store:
+            return None
+
+        return SystemConfiguration.SCDynamicStoreCopyMultiple(store, list(_SNAPSHOT_KEYS), [_INTERFACE_IPV4_PATTERN])
+
+    except Exception as e:
+        logger.debug(f"Native network state snapshot failed: {e}")
+        return None
+
+
+# Snapshot being served to copy_store_value() during an evaluation, if any
+_state_snapshot = None
+
+
+def set_network_state_snapshot(snapshot):
+    """
+    Serve global state reads from a snapshot taken by get_network_state_snapshot().
+
+    The watcher sets this for the duration of one evaluation so the lookups
+    made along the way read one consistent copy instead of each asking
+    configd again. Pass None to go back to reading the store.
+    """
+    global _state_snapshot
+    _state_snapshot = snapshot
+
+
+def copy_store_value(key):
+    """
+    Read one dynamic store key, from the current snapshot when it covers the key.
+
+    Returns:
+        The key's value, or None if it's unset or the store is unavailable
+    """
+    snapshot = _state_snapshot
+    if snapshot is not None and key in _SNAPSHOT_KEYS:
+        return snapshot.get(key)
+
+    if not SystemConfiguration:
+        return None
+
+    store = _get_dynamic_store()
+    if not store:
+        return None
+    return SystemConfiguration.SCDynamicStoreCopyValue(store, key)
+
+
+@functools.lru_cache(maxsize=64)
 def get_service_name_native(service_id):
-    """Get service name using SystemConfiguration instead of scutil."""
+    """
+    Get service name using SystemConfiguration instead of scutil.
+
+    Results are memoized per service ID; call invalidate_service_cache() when
+    the network configuration may have changed.
+    """
     if not SystemConfiguration:
         return None
 
     try:
-        # Create a dynamic store
-        store = SystemConfiguration.SCDynamicStoreCreate(None, "NetWatcher", None, None)
+        store = _get_dynamic_store()
         if not store:
             return None
 
@@ -147,20 +263,19 @@ def get_service_name_native(service_id):
         return None
 
 
+def invalidate_service_cache():
+    """Forget memoized service names so the next lookup reads the store again."""
+    get_service_name_native.cache_clear()
+
+
 def get_default_route_interface_native():
     """Get the default route interface using native APIs instead of netstat."""
     if not SystemConfiguration:
         return None
 
     try:
-        # Create a dynamic store
-        store = SystemConfiguration.SCDynamicStoreCreate(None, "NetWatcher", None, None)
-        if not store:
-            return None
-
         # Get global IPv4 state
-        ipv4_key = "State:/Network/Global/IPv4"
-        ipv4_dict = SystemConfiguration.SCDynamicStoreCopyValue(store, ipv4_key)
+        ipv4_dict = copy_store_value(_GLOBAL_IPV4_KEY)
 
         if not ipv4_dict:
             logger.debug("No global IPv4 configuration found")
@@ -179,16 +294,110 @@ def get_default_route_interface_native():
         return None
 
 
+# Interface IPs are re-read at most this often while the network is settling
+INTERFACE_IP_CACHE_TTL = 2.0  # seconds
+
+# interface -> (monotonic timestamp, IP address or None)
+_interface_ip_cache = {}
+
+
+def invalidate_interface_ip_cache(interface=None):
+    """Forget the cached IP for one interface, or for all interfaces."""
+    if interface is None:
+        _interface_ip_cache.clear()
+    else:
+        _interface_ip_cache.pop(interface, None)
+
+
 def get_interface_ip_native(interface):
     """
     Get IP address for a network interface.
 
+    Results are cached for INTERFACE_IP_CACHE_TTL seconds so bursts of lookups
+    during a network change don't each query the interface (or run ifconfig).
+
     Args:
         interface: Network interface name (e.g., 'en0', 'Wi-Fi')
 
     Returns:
         str: IP address in dotted decimal notation, or None if not found
     """
+    cached = _interface_ip_cache.get(interface)
+    now = time.monotonic()
+    if cached and now - cached[0] < INTERFACE_IP_CACHE_TTL:
+        return cached[1]
+
+    ip = _lookup_interface_ip(interface)
+    _interface_ip_cache[interface] = (now, ip)
+    return ip
+
+
+class _Ifaddrs(ctypes.Structure):
+    """struct ifaddrs from <ifaddrs.h>."""
+
+
+_Ifaddrs._fields_ = [
+    ("ifa_next", ctypes.POINTER(_Ifaddrs)),
+    ("ifa_name", ctypes.c_char_p),
+    ("ifa_flags", ctypes.c_uint),
+    ("ifa_addr", ctypes.c_void_p),
+    ("ifa_netmask", ctypes.c_void_p),
+    ("ifa_dstaddr", ctypes.c_void_p),
+    ("ifa_data", ctypes.c_void_p),
+]
+
+# BSD sockaddrs start with a length byte, so sa_family is the second byte;
+# on Linux it's a 16-bit field at the start
+_SA_FAMILY_OFFSET, _SA_FAMILY_TYPE = (1, ctypes.c_uint8) if sys.platform == "darwin" else (0, ctypes.c_uint16)
+_SIN_ADDR_OFFSET = 4  # after the family and port fields on both layouts
+
+_libc = None
+
+
+def _load_libc():
+    """Load libc with getifaddrs/freeifaddrs prototypes, once."""
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.getifaddrs.argtypes = [ctypes.POINTER(ctypes.POINTER(_Ifaddrs))]
+        libc.getifaddrs.restype = ctypes.c_int
+        libc.freeifaddrs.argtypes = [ctypes.POINTER(_Ifaddrs)]
+        libc.freeifaddrs.restype = None
+        _libc = libc
+    return _libc
+
+
+def _getifaddrs_ipv4(interface):
+    """
+    Get an interface's first IPv4 address with getifaddrs(3) through ctypes.
+
+    Raises:
+        OSError if getifaddrs fails
+    """
+    libc = _load_libc()
+    head = ctypes.POINTER(_Ifaddrs)()
+    if libc.getifaddrs(ctypes.byref(head)) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"getifaddrs failed: {os.strerror(errno)}")
+
+    try:
+        name = interface.encode()
+        node = head
+        while node:
+            entry = node.contents
+            if entry.ifa_addr and entry.ifa_name == name:
+                family = _SA_FAMILY_TYPE.from_address(entry.ifa_addr + _SA_FAMILY_OFFSET).value
+                if family == socket.AF_INET:
+                    packed = ctypes.string_at(entry.ifa_addr + _SIN_ADDR_OFFSET, 4)
+                    return socket.inet_ntop(socket.AF_INET, packed)
+            node = entry.ifa_next
+        return None
+    finally:
+        libc.freeifaddrs(head)
+
+
+def _lookup_interface_ip(interface):
+    """Look up an interface's IPv4 address, uncached."""
     if netifaces:
         try:
             # Use netifaces library for cross-platform interface IP lookup
@@ -206,12 +415,31 @@ def get_interface_ip_native(interface):
             logger.debug(f"Failed to get IP for interface {interface}: {e}")
             return None
 
-    # Fallback: parse ifconfig output when netifaces is not available
+    # Next, ask libc directly - the same getifaddrs(3) call netifaces makes
+    try:
+        ip = _getifaddrs_ipv4(interface)
+        if ip:
+            logger.debug(f"Found IP {ip} for interface {interface}")
+        else:
+            logger.debug(f"Interface {interface} has no IPv4 address")
+        return ip
+    except Exception as e:
+        logger.debug(f"getifaddrs lookup failed, using command fallback: {e}")
+
+    # Last resort: parse ifconfig output
     logger.debug("netifaces not available, using command fallback")
     try:
-        result = subprocess.run(["ifconfig", interface], capture_output=True, text=True, timeout=5)
+        # Only reached if getifaddrs itself failed, so keep a hung ifconfig from
+        # stalling the evaluation. A fixed C locale keeps the output parseable.
+        result = subprocess.run(
+            [IFCONFIG, interface],
+            capture_output=True,
+            text=True,
+            timeout=IFCONFIG_TIMEOUT,
+            env={"LC_ALL": "C"},
+        )
         if result.returncode == 0:
-            match = re.search(r"inet (\d+\.\d+\.\d+\.\d+)", result.stdout)
+            match = _INET_RE.search(result.stdout)
             if match:
                 ip = match.group(1)
                 logger.debug(f"Found IP {ip} for interface {interface}")
@@ -1,36 +1,94 @@
+import functools
 import importlib.resources
+import logging
 import os
-import subprocess
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Ensure system paths are in the PATH for launchd, which has a minimal environment
 os.environ["PATH"] = "/usr/bin:/bin:/usr/sbin:/sbin:" + os.environ.get("PATH", "")
 
 import rumps
-from threading import Timer
-from CoreFoundation import (
-    CFRunLoopAddSource,
-    CFRunLoopGetCurrent,
-    kCFRunLoopDefaultMode,
-)
-from SystemConfiguration import (
-    SCDynamicStoreCreate,
-    SCDynamicStoreCreateRunLoopSource,
-    SCDynamicStoreSetNotificationKeys,
-)
+from PyObjCTools import AppHelper
 
 from . import config
-from .location import check_and_apply_location_settings
+from .location import (
+    apply_detected_location,
+    check_and_apply_location_settings,
+    detect_location,
+)
 from .external import get_connection_details
 from .utils import run_command
+from .utils.native import (
+    copy_store_value,
+    get_network_state_snapshot,
+    invalidate_interface_ip_cache,
+    invalidate_service_cache,
+    set_dynamic_store,
+    set_network_state_snapshot,
+)
 from .location.settings import create_vpn_resolver_files, remove_vpn_resolver_files
 from .network import (
     get_default_route_interface,
     get_current_dns_servers,
     get_all_active_services,
+    get_current_ssid,
     clear_cache,
 )
 from .network.configuration import set_proxy
-from .logging_config import setup_logging, get_logger
+from .logging_config import setup_logging, get_logger, shutdown_logging
+
+# Upper bound on services whose proxies are disabled concurrently on VPN disconnect
+MAX_PROXY_WORKERS = 8
+
+# Seconds a public IP lookup is reused while the network it was made on is unchanged
+CONNECTION_DETAILS_TTL = 60.0
+
+
+@functools.lru_cache(maxsize=1)
+def _icon_path():
+    """
+    Resolve the menu bar icon's path once per process.
+
+    files() points at the installed file directly; path() is deprecated and
+    may extract a temporary copy.
+    """
+    return str(importlib.resources.files("src").joinpath("icon_menu.png"))
+
+
+# VPN status line prefix -> menu label, e.g. "IP: <ip>" becomes "VPN IP: <ip>"
+_VPN_MENU_LABELS = {
+    "VPN Connected to ": "VPN endpoint: ",
+    "IP: ": "VPN IP: ",
+    "Protocol: ": "VPN Protocol: ",
+}
+
+# Connection info keys that are acronyms, shown uppercase instead of capitalized
+_CONNECTION_DISPLAY_KEYS = {"ip": "IP", "isp": "ISP"}
+
+# One non-blank VPN status line, stripped, with its known prefix (if any) split off
+_VPN_STATUS_LINE_RE = re.compile(
+    r"^\s*(?P<line>(?P<prefix>" + "|".join(map(re.escape, _VPN_MENU_LABELS)) + r")?.*?\S)\s*$",
+    re.MULTILINE,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _vpn_menu_rows(vpn_status):
+    """
+    Format VPN status text as menu rows, one per non-empty line.
+
+    Known fields get cleaner labels and other VPN info is shown as is. The
+    status is usually identical from one menu update to the next, so the last
+    result is cached.
+    """
+    rows = []
+    for match in _VPN_STATUS_LINE_RE.finditer(vpn_status):
+        line, prefix = match.group("line", "prefix")
+        rows.append(_VPN_MENU_LABELS[prefix] + line[len(prefix):] if prefix else line)
+    return tuple(rows)
 
 
 class NetWatcherApp(rumps.App):
@@ -46,13 +104,23 @@ class NetWatcherApp(rumps.App):
 
         # We don't need to store the name separately, it's in self.name from rumps
         self.config_path = config.get_config_path()
-        self.config = config.load_config()
+        self.config = config.load_config_cached()
         self.current_location = None
-        self.debounce_timer = None
-        self.is_evaluating = False  # Flag to prevent concurrent evaluations
+        # Debounce state: one worker thread waits until the deadline stops moving
+        self.debounce_deadline = 0.0
+        self.debounce_wakeup = threading.Event()
+        self.debounce_thread = None
+        self.last_evaluation_time = float("-inf")  # time.monotonic() of the last evaluation
+        self.evaluation_lock = threading.Lock()  # Held while an evaluation runs
+        # Single persistent worker that runs evaluations and manual tests in order
+        self.evaluation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="NetWatcherEval")
         self.runloop = None
+        self.sc_queue = None  # Keeps the notification dispatch queue alive
         self.store = None
         self.prev_vpn_active = False
+        self.last_network_fingerprint = None
+        self.menu_content = None  # Text rows shown by the last update_menu() rebuild
+        self.connection_details_cache = None  # (network key, time.monotonic(), details)
         self.created_resolver_files = []
 
         # Set up logging with debug flag from config, forcing reinit to override any early setup
@@ -64,16 +132,11 @@ class NetWatcherApp(rumps.App):
 
         # Set the icon
         try:
-            with importlib.resources.path("src", "icon_menu.png") as icon_path:
-                # Load the icon path
-                icon_path_str = str(icon_path)
+            self.icon = _icon_path()
 
-                # Set the icon
-                self.icon = icon_path_str
-
-                # For menu bar icons, we need template mode for proper transparency
-                # This tells macOS to treat the image as a template (black pixels become appropriate for menu bar)
-                self.template = True
+            # For menu bar icons, we need template mode for proper transparency
+            # This tells macOS to treat the image as a template (black pixels become appropriate for menu bar)
+            self.template = True
 
         except Exception as e:
             self.logger.warning(f"Failed to set application icon: {e}")
@@ -89,31 +152,70 @@ class NetWatcherApp(rumps.App):
         """Sets up the initial state of the menu bar."""
         self.title = ""  # No text, just show the icon
         self.menu.clear()
-        self.menu = [
-            "NetWatcher",
-            None,
+        # The footer items are built once; menu.clear() detaches them, so every
+        # rebuild re-adds the same objects instead of allocating new ones
+        self.menu_footer = [
             rumps.MenuItem("Test Configuration", callback=self.run_test),
             None,
             rumps.MenuItem("Quit", callback=self.quit_app),
         ]
+        self.menu = ["NetWatcher", None, *self.menu_footer]
 
     def setup_watcher(self):
         """Sets up the SystemConfiguration watcher."""
+        # Imported here so the bridges load once the app is built, not at import
+        from CoreFoundation import (
+            CFRunLoopAddSource,
+            CFRunLoopGetCurrent,
+            kCFRunLoopDefaultMode,
+        )
+        from SystemConfiguration import (
+            SCDynamicStoreCreate,
+            SCDynamicStoreCreateRunLoopSource,
+            SCDynamicStoreSetDispatchQueue,
+            SCDynamicStoreSetNotificationKeys,
+        )
+
+        try:
+            import libdispatch
+        except ImportError:
+            libdispatch = None
+
         self.store = SCDynamicStoreCreate(None, self.name, self.sc_callback, None)
         if self.store:
+            # Let the native helpers read through this session instead of their own
+            set_dynamic_store(self.store)
+
             keys_to_watch = [
                 "State:/Network/Global/IPv4",
                 "State:/Network/Interface/.*/IPv4",
             ]
             SCDynamicStoreSetNotificationKeys(self.store, keys_to_watch, None)
-            self.runloop = CFRunLoopGetCurrent()
-            source = SCDynamicStoreCreateRunLoopSource(None, self.store, 0)
-            CFRunLoopAddSource(self.runloop, source, kCFRunLoopDefaultMode)
-            self.logger.info("SystemConfiguration watcher is set up")
+
+            # Deliver notifications on a private serial queue so bursts of
+            # changes don't go through the main run loop that drives the menu.
+            # sc_callback only touches thread-safe debounce state.
+            on_queue = False
+            if libdispatch is not None:
+                self.sc_queue = libdispatch.dispatch_queue_create(b"com.user.netwatcher.sc", None)
+                on_queue = bool(SCDynamicStoreSetDispatchQueue(self.store, self.sc_queue))
+
+            if not on_queue:
+                self.runloop = CFRunLoopGetCurrent()
+                source = SCDynamicStoreCreateRunLoopSource(None, self.store, 0)
+                CFRunLoopAddSource(self.runloop, source, kCFRunLoopDefaultMode)
+
+            self.logger.info(
+                f"SystemConfiguration watcher is set up ({'dispatch queue' if on_queue else 'run loop'})"
+            )
+
+            self.debounce_thread = threading.Thread(
+                target=self._debounce_worker, name="NetWatcherDebounce", daemon=True
+            )
+            self.debounce_thread.start()
 
             # Trigger initial evaluation after a short delay
-            self.debounce_timer = Timer(1.0, self.evaluate_network_state)
-            self.debounce_timer.start()
+            self.schedule_evaluation(1.0)
         else:
             self.logger.error("Failed to create SCDynamicStore")
 
@@ -121,12 +223,6 @@ class NetWatcherApp(rumps.App):
         """Updates the menu bar title and menu items."""
         self.title = ""  # No text, just show the icon
 
-        # Clear existing menu completely to avoid duplicates
-        try:
-            self.menu.clear()
-        except Exception as e:
-            self.logger.error(f"Menu clear error: {e}")
-
         # Build menu from scratch to avoid menu item conflicts
         menu_items = [
             "NetWatcher",
@@ -135,53 +231,34 @@ class NetWatcherApp(rumps.App):
         ]
 
         if vpn_status:
-            # Split VPN status into separate menu items for better display
-            vpn_lines = vpn_status.split("\n")
-            for line in vpn_lines:
-                if line.strip():  # Only add non-empty lines
-                    stripped_line = line.strip()
-                    # Format VPN menu items with cleaner labels
-                    if stripped_line.startswith("VPN Connected to "):
-                        # Extract server from "VPN Connected to <server>"
-                        server = stripped_line.replace("VPN Connected to ", "")
-                        menu_items.append(f"VPN endpoint: {server}")
-                    elif stripped_line.startswith("IP: "):
-                        # Change "IP: <ip>" to "VPN IP: <ip>"
-                        ip = stripped_line.replace("IP: ", "")
-                        menu_items.append(f"VPN IP: {ip}")
-                    elif stripped_line.startswith("Protocol: "):
-                        # Change "Protocol: <protocol>" to "VPN Protocol: <protocol>"
-                        protocol = stripped_line.replace("Protocol: ", "")
-                        menu_items.append(f"VPN Protocol: {protocol}")
-                    else:
-                        # Fallback for any other VPN info
-                        menu_items.append(stripped_line)
+            menu_items.extend(_vpn_menu_rows(vpn_status))
 
         menu_items.append(None)
 
         if connection_info:
             for key, value in connection_info.items():
-                # Special cases for acronyms to show as uppercase
-                if key.lower() == "ip":
-                    display_key = "IP"
-                elif key.lower() == "isp":
-                    display_key = "ISP"
-                else:
-                    display_key = key.capitalize()
+                display_key = _CONNECTION_DISPLAY_KEYS.get(key.lower()) or key.capitalize()
                 menu_items.append(f"{display_key}: {value}")
             menu_items.append(None)
 
-        # Create fresh menu items each time to avoid conflicts
-        menu_items.extend(
-            [
-                rumps.MenuItem("Test Configuration", callback=self.run_test),
-                None,
-                rumps.MenuItem("Quit", callback=self.quit_app),
-            ]
-        )
+        # Rebuilding the menu round-trips through AppKit; skip it if the rows
+        # it would show are exactly the ones already shown
+        menu_content = tuple(menu_items)
+        if menu_content == self.menu_content:
+            self.logger.debug("Menu content unchanged, skipping rebuild")
+            return
+
+        # Clear existing menu completely to avoid duplicates
+        try:
+            self.menu.clear()
+        except Exception as e:
+            self.logger.error(f"Menu clear error: {e}")
+
+        menu_items.extend(self.menu_footer)
 
         try:
             self.menu = menu_items
+            self.menu_content = menu_content
         except Exception as e:
             self.logger.error(f"Menu assignment error: {e}")
 
@@ -189,22 +266,40 @@ class NetWatcherApp(rumps.App):
         """Callback to manually run a configuration test."""
         self.logger.info("Manual test triggered from menu bar.")
 
-        # Clear cache to ensure fresh data for manual test
-        clear_cache()
+        # The test runs subprocesses, so keep it off the main thread; sharing the
+        # evaluation worker also keeps it from overlapping an automatic evaluation
+        self.evaluation_executor.submit(self._run_manual_test)
 
-        # Reload config in case user changed it since last network evaluation
-        self.config = config.load_config()
+    def _run_manual_test(self):
+        """Run a configuration test on the evaluation worker and report the result."""
+        try:
+            # Clear caches to ensure fresh data for manual test
+            clear_cache()
+            invalidate_service_cache()
+            invalidate_interface_ip_cache()
+            # A manual test must show a fresh public IP, not the memoized one
+            self.connection_details_cache = None
+
+            # Reload config in case user changed it since last network evaluation
+            # (only re-parsed if the file changed)
+            self.config = config.load_config_cached()
+
+            # Run the evaluation
+            location_name, vpn_active, vpn_details = check_and_apply_location_settings(
+                self.config
+            )
+            self.current_location = location_name
 
-        # Run the evaluation
-        location_name, vpn_active, vpn_details = check_and_apply_location_settings(
-            self.config
-        )
-        self.current_location = location_name
+            # Update the menu to reflect any changes
+            connection_info = self.cached_connection_details(location_name, vpn_active)
+        except Exception as e:
+            self.logger.error(f"Manual test failed: {e}")
+            return
 
-        # Update the menu to reflect any changes
-        connection_info = get_connection_details(silent=True)
-        # Use VPN details from the evaluation (no need to fetch again)
-        self.update_menu(
+        # Use VPN details from the evaluation (no need to fetch again); AppKit
+        # objects belong to the main thread
+        AppHelper.callAfter(
+            self.update_menu,
             location_name,
             connection_info=connection_info,
             vpn_status=vpn_details,
@@ -217,7 +312,8 @@ class NetWatcherApp(rumps.App):
             message = "No matching location found for current network"
 
         # Use rumps notification - try to force banner style
-        rumps.notification(
+        AppHelper.callAfter(
+            rumps.notification,
             title="NetWatcher Test",
             subtitle="Configuration Test Complete",
             message=message,
@@ -245,53 +341,112 @@ class NetWatcherApp(rumps.App):
                 self.logger.info("Opening log file from NetWatcher Test match")
                 self.open_log_file()
             else:
-                self.logger.info(
-                    f"No match found for notification info: {type(info)} - {dir(info)}"
-                )
+                self.logger.info(f"No match found for notification info: {type(info)}")
+                # dir() walks every attribute of the (often Objective-C) object,
+                # so only build that listing when it will actually be logged
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(f"Notification info attributes: {dir(info)}")
 
     def open_log_file(self):
         """Open the log file in the default application (usually Console.app)."""
         log_file = config.LOG_FILE
         try:
-            # Use 'open' command to open the log file with the default application
-            subprocess.run(["open", str(log_file)], check=True)
-            self.logger.info(f"Opened log file: {log_file}")
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Failed to open log file: {e}")
+            # Ask NSWorkspace directly, the same call open(1) makes, without
+            # spawning a process
+            import AppKit
+
+            url = AppKit.NSURL.fileURLWithPath_(str(log_file))
+            if AppKit.NSWorkspace.sharedWorkspace().openURL_(url):
+                self.logger.info(f"Opened log file: {log_file}")
+            else:
+                self.logger.error(f"Failed to open log file: {log_file}")
         except Exception as e:
             self.logger.error(f"Unexpected error opening log file: {e}")
 
     def sc_callback(self, *args):
         """SystemConfiguration callback for network changes."""
+        # Services can be added or renamed along with any network change
+        invalidate_service_cache()
+
+        # Drop cached IPs of interfaces whose IPv4 state changed
+        # (args are store, changed_keys, info)
+        changed_keys = args[1] if len(args) > 1 and args[1] else ()
+        for key in changed_keys:
+            parts = str(key).split("/")
+            if len(parts) == 5 and parts[:3] == ["State:", "Network", "Interface"] and parts[4] == "IPv4":
+                invalidate_interface_ip_cache(parts[3])
+
         # If we're already evaluating, ignore additional callbacks
-        if self.is_evaluating:
+        if self.evaluation_lock.locked():
             self.logger.debug("Network change detected during evaluation, ignoring")
             return
 
-        # Cancel any existing debounce timer
-        timer_was_active = self.debounce_timer is not None
-        if self.debounce_timer is not None:
-            self.debounce_timer.cancel()
+        settings = self.config.get("settings", {})
+        debounce_seconds = float(settings.get("debounce_seconds", 5))
+
+        # Optionally react to the first change after a quiet period right away;
+        # changes that follow within the window are debounced as usual, giving
+        # one trailing evaluation once the network settles
+        if (
+            settings.get("debounce_leading_edge", False)
+            and not self.debounce_wakeup.is_set()
+            and time.monotonic() - self.last_evaluation_time > debounce_seconds
+        ):
+            self.logger.debug("Network change detected after idle period, evaluating now")
+            self.schedule_evaluation(0.0)
+            return
 
-        # Only log the debounce message if there wasn't already a timer running
+        # Push the debounce deadline back; only log when no evaluation was pending
         # Simple approach like bash script: just wait for things to settle, then evaluate
-        debounce_seconds = self.config.get("settings", {}).get("debounce_seconds", 5)
-        self.debounce_timer = Timer(
-            float(debounce_seconds), self.evaluate_network_state
-        )
-        self.debounce_timer.start()
+        timer_was_active = self.schedule_evaluation(debounce_seconds)
 
         if not timer_was_active:
             self.logger.debug("Network change detected, starting debounce timer")
 
+    def schedule_evaluation(self, delay):
+        """
+        Schedule a network evaluation delay seconds from now, replacing any pending one.
+
+        Returns:
+            True if an evaluation was already pending
+        """
+        was_pending = self.debounce_wakeup.is_set()
+        self.debounce_deadline = time.monotonic() + delay
+        self.debounce_wakeup.set()
+        return was_pending
+
+    def _debounce_worker(self):
+        """Run evaluations once the debounce deadline has passed without being pushed back."""
+        while True:
+            self.debounce_wakeup.wait()
+
+            # Sleep until the deadline stops moving. Clearing the event and then
+            # re-checking the deadline catches a callback landing in between.
+            while True:
+                remaining = self.debounce_deadline - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+                    continue
+                self.debounce_wakeup.clear()
+                if self.debounce_deadline <= time.monotonic():
+                    break
+
+            # Hand the evaluation to the worker and wait for it, so a manual
+            # test queued meanwhile runs in order rather than concurrently
+            try:
+                self.evaluation_executor.submit(self.evaluate_network_state).result()
+            except Exception as e:
+                self.logger.error(f"Network evaluation failed: {e}")
+
     def evaluate_network_state(self, *args):
         """The core logic to check network and apply settings."""
-        # Set the evaluation flag to prevent concurrent evaluations
-        if self.is_evaluating:
+        # Take the evaluation lock to prevent concurrent evaluations; unlike a
+        # flag, the check and the claim happen atomically
+        if not self.evaluation_lock.acquire(blocking=False):
             self.logger.debug("Evaluation already in progress, skipping")
             return
 
-        self.is_evaluating = True
+        self.last_evaluation_time = time.monotonic()
 
         try:
             self.logger.debug("Evaluating network state after debounce")
@@ -299,14 +454,22 @@ class NetWatcherApp(rumps.App):
             # Clear network state cache to ensure fresh data
             clear_cache()
 
+            # Flapping notifications often leave the network exactly as it was
+            fingerprint = self.network_fingerprint()
+            if fingerprint is not None and fingerprint == self.last_network_fingerprint:
+                self.logger.debug("Network state unchanged since last evaluation, skipping")
+                return
+
+            # Serve this evaluation's global state lookups from the same snapshot
+            if fingerprint is not None:
+                set_network_state_snapshot(fingerprint[0])
+
             # Use existing config (don't reload on every network change)
             # Config is only reloaded for manual tests in case user changed it
 
-            # First check without applying or fetching VPN details
-            new_location, vpn_active, _ = check_and_apply_location_settings(
+            # First detect the location without applying or fetching VPN details
+            new_location, vpn_active = detect_location(
                 self.config,
-                apply=False,
-                fetch_details=False,
                 log_level=10,  # DEBUG level
             )
 
@@ -314,11 +477,9 @@ class NetWatcherApp(rumps.App):
             vpn_changed = vpn_active != self.prev_vpn_active
 
             if location_changed or vpn_changed:
-                # Apply settings and fetch VPN details if changed
-                location_name, vpn_active, vpn_details = (
-                    check_and_apply_location_settings(
-                        self.config, apply=True, fetch_details=True
-                    )
+                # Apply settings for the detected location and fetch VPN details
+                location_name, vpn_active, vpn_details = apply_detected_location(
+                    self.config, new_location, vpn_active, fetch_details=True
                 )
                 self.current_location = location_name
 
@@ -342,16 +503,23 @@ class NetWatcherApp(rumps.App):
                         run_command(["sudo", "dscacheutil", "-flushcache"])
                         self.created_resolver_files = []
 
-                        # Disable proxies on all active services on disconnect
+                        # Disable proxies on all active services on disconnect. Each
+                        # service is a handful of networksetup runs, independent of
+                        # the others, so run them side by side.
                         active_services = get_all_active_services()
-                        for serv_name, iface in active_services:
-                            set_proxy(serv_name, None)
+                        if active_services:
+                            with ThreadPoolExecutor(
+                                max_workers=min(MAX_PROXY_WORKERS, len(active_services))
+                            ) as executor:
+                                list(executor.map(lambda service: set_proxy(service[0], None), active_services))
 
                     self.prev_vpn_active = vpn_active
 
-                # Update the menu bar title and menu items
-                connection_info = get_connection_details(silent=True)
-                self.update_menu(
+                # Update the menu bar title and menu items. This runs on the
+                # evaluation worker, and AppKit objects belong to the main thread.
+                connection_info = self.cached_connection_details(location_name, vpn_active)
+                AppHelper.callAfter(
+                    self.update_menu,
                     location_name,
                     connection_info=connection_info,
                     vpn_status=vpn_details,
@@ -361,10 +529,51 @@ class NetWatcherApp(rumps.App):
                     f"No changes detected: location='{new_location}', VPN active={vpn_active}"
                 )
 
+            self.last_network_fingerprint = fingerprint
+
         finally:
-            # Always clear the evaluation flag and network cache
-            self.is_evaluating = False
+            # Always clear the snapshot and network cache, then release the lock
+            set_network_state_snapshot(None)
             clear_cache()
+            self.evaluation_lock.release()
+
+    def network_fingerprint(self):
+        """
+        Capture what location matching depends on, for cheap change detection.
+
+        The SSID is included because two Wi-Fi networks can otherwise look
+        identical; it's served from the network state cache, so the evaluation
+        that follows doesn't look it up again.
+
+        Returns:
+            Comparable fingerprint, or None if the state can't be captured
+        """
+        snapshot = get_network_state_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot, get_current_ssid(log_level=10)  # DEBUG
+
+    def cached_connection_details(self, location_name, vpn_active):
+        """
+        Get public IP details, reusing a recent lookup made on the same network.
+
+        The lookup is an HTTP request, so it is repeated only when the primary
+        IPv4 state, location (and with it the proxy) or VPN state changed, or
+        the cached answer is older than CONNECTION_DETAILS_TTL. Failed lookups
+        (all "N/A") are not cached.
+        """
+        key = (copy_store_value("State:/Network/Global/IPv4"), location_name, vpn_active)
+        cached = self.connection_details_cache
+        if cached is not None and cached[0] == key and time.monotonic() - cached[1] < CONNECTION_DETAILS_TTL:
+            self.logger.debug("Reusing connection details from the last lookup")
+            return cached[2]
+
+        details = get_connection_details(silent=True)
+        if details and details.get("ip", "N/A") != "N/A":
+            self.connection_details_cache = (key, time.monotonic(), details)
+        else:
+            self.connection_details_cache = None
+        return details
 
     def quit_app(self, _):
         """Gracefully stop the launchd service and quit the app."""
@@ -373,7 +582,7 @@ class NetWatcherApp(rumps.App):
             plist_path = config.LAUNCH_AGENT_PLIST_PATH
             if plist_path.exists():
                 # Use run_command from utils for consistency
-                run_command(["launchctl", "unload", "-w", str(plist_path)])
+                run_command([config.LAUNCHCTL, "unload", "-w", str(plist_path)])
             else:
                 self.logger.warning(
                     f"Launch agent plist not found at {plist_path}, cannot unload."
@@ -381,6 +590,10 @@ class NetWatcherApp(rumps.App):
         except Exception as e:
             self.logger.error(f"Failed to unload launchd service: {e}")
 
+        # NSApplication terminates the process without running Python's atexit
+        # hooks, so write out the queued log records now; anything logged after
+        # this (e.g. by rumps) goes straight to the log file
+        shutdown_logging()
         rumps.quit_application()
 
 
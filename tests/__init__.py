@@ -1,5 +0,0 @@
-"""
-NetWatcher test suite.
-
-This package contains automated tests for the NetWatcher application.
-"""
@@ -4,50 +4,67 @@ Pytest configuration and shared fixtures for NetWatcher tests.
 This module provides reusable fixtures and configuration for all tests.
 """
 
+import copy
+import io
+import json
 import pytest
+import toml
+import urllib.error
+from contextlib import ExitStack
 from pathlib import Path
-from unittest.mock import MagicMock, Mock
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+
+# Sample configuration behind the mock_config fixtures
+MOCK_CONFIG = {
+    "settings": {
+        "debug": False,
+        "debounce_seconds": 5,
+        "shell_proxy_enabled": True,
+    },
+    "locations": {
+        "Home": {
+            "ssids": ["HomeWiFi"],
+            "dns_servers": ["192.168.1.1"],
+            "dns_search_domains": ["home.local"],
+            "proxy_url": "",
+            "printer": "Home_Printer",
+            "ntp_server": "time.apple.com",
+        },
+        "Office": {
+            "ssids": ["CorpWiFi"],
+            "dns_servers": ["10.1.1.10", "10.1.1.11"],
+            "dns_search_domains": ["corp.company.com"],
+            "proxy_url": "http://proxy.company.com/proxy.pac",
+            "printer": "Office_Printer",
+            "ntp_server": "time.company.com",
+        },
+        "default": {
+            "ssids": [],
+            "dns_servers": ["8.8.8.8", "1.1.1.1"],
+            "dns_search_domains": [],
+            "proxy_url": "",
+            "printer": "",
+            "ntp_server": "time.apple.com",
+        },
+    },
+}
 
 
 @pytest.fixture
 def mock_config():
-    """Provide a mock configuration dictionary."""
-    return {
-        "settings": {
-            "debug": False,
-            "debounce_seconds": 5,
-            "shell_proxy_enabled": True,
-        },
-        "locations": {
-            "Home": {
-                "ssids": ["HomeWiFi"],
-                "dns_servers": ["192.168.1.1"],
-                "dns_search_domains": ["home.local"],
-                "proxy_url": "",
-                "printer": "Home_Printer",
-                "ntp_server": "time.apple.com",
-            },
-            "Office": {
-                "ssids": ["CorpWiFi"],
-                "dns_servers": ["10.1.1.10", "10.1.1.11"],
-                "dns_search_domains": ["corp.company.com"],
-                "proxy_url": "http://proxy.company.com/proxy.pac",
-                "printer": "Office_Printer",
-                "ntp_server": "time.company.com",
-            },
-            "default": {
-                "ssids": [],
-                "dns_servers": ["8.8.8.8", "1.1.1.1"],
-                "dns_search_domains": [],
-                "proxy_url": "",
-                "printer": "",
-                "ntp_server": "time.apple.com",
-            },
-        },
-    }
+    """Provide a mock configuration dictionary (a fresh copy; tests may modify it)."""
+    return copy.deepcopy(MOCK_CONFIG)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def mock_config_toml_bytes():
+    """Provide the mock configuration serialized as a TOML config file."""
+    return toml.dumps(MOCK_CONFIG).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
 def mock_networksetup_outputs():
     """Provide mock outputs from networksetup commands."""
     return {
@@ -77,7 +94,7 @@ Authenticated Proxy Enabled: 0
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_pac_file_content():
     """Provide a mock PAC file content."""
     return """
@@ -95,7 +112,7 @@ function FindProxyForURL(url, host) {
 """
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_ipapi_response():
     """Provide a mock response from ip-api.com."""
     return {
@@ -107,6 +124,85 @@ def mock_ipapi_response():
     }
 
 
+@pytest.fixture(scope="session")
+def mock_ipapi_response_bytes(mock_ipapi_response):
+    """Provide the mock ip-api.com response encoded as the HTTP body."""
+    return json.dumps(mock_ipapi_response).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def http_500_error():
+    """Provide an HTTP 500 error from ip-api.com."""
+    return urllib.error.HTTPError("http://ip-api.com/json", 500, "Internal Server Error", {}, None)
+
+
+@pytest.fixture(scope="session")
+def url_timeout_error():
+    """Provide a URLError for a timed-out request."""
+    return urllib.error.URLError("timed out")
+
+
+@pytest.fixture(scope="class")
+def ipapi_patches():
+    """
+    Patch the proxy lookup and urllib opener used by get_connection_details.
+
+    Class-scoped, so a test class enters the patches once; use mock_ipapi_opener
+    to get them reset and configured for each test.
+    """
+    with ExitStack() as stack:
+        yield (
+            stack.enter_context(patch("src.external.ipinfo.get_urllib_proxy_handler")),
+            stack.enter_context(patch("urllib.request.build_opener")),
+        )
+
+
+@pytest.fixture
+def mock_ipapi_opener(ipapi_patches):
+    """
+    Configure the ip-api.com request made by get_connection_details.
+
+    Returns a function that sets what the request returns: a response body, or
+    an error for opener.open() to raise, optionally behind a proxy handler. It
+    returns the (get_urllib_proxy_handler, build_opener) mocks for assertions.
+    """
+    mock_get_handler, mock_build_opener = ipapi_patches
+    # The patches outlive a single test, so start each test from clean mocks
+    mock_get_handler.reset_mock()
+    mock_build_opener.reset_mock()
+
+    def configure(body=None, error=None, handler=None):
+        mock_get_handler.return_value = handler
+        # Only open() is used on the opener, so it needs no MagicMock of its own
+        mock_open = Mock()
+        mock_build_opener.return_value = SimpleNamespace(open=mock_open)
+        if error is not None:
+            mock_open.side_effect = error
+        else:
+            # BytesIO is already a context manager with a read(), so it can
+            # stand in for the response without a chain of child mocks
+            mock_open.return_value = io.BytesIO(body)
+        return mock_get_handler, mock_build_opener
+
+    return configure
+
+
+@pytest.fixture
+def multipatch():
+    """
+    Patch several targets for the rest of the test from one ExitStack.
+
+    Yields a function taking dotted target paths (plus any patch() keyword
+    arguments) that returns the mocks in the same order.
+    """
+    with ExitStack() as stack:
+
+        def patch_all(*targets, **kwargs):
+            return [stack.enter_context(patch(target, **kwargs)) for target in targets]
+
+        yield patch_all
+
+
 @pytest.fixture
 def temp_config_dir(tmp_path):
     """Provide a temporary config directory."""
@@ -115,6 +211,19 @@ def temp_config_dir(tmp_path):
     return config_dir
 
 
+@pytest.fixture(scope="module")
+def shared_config_dir(tmp_path_factory):
+    """
+    Provide a config directory shared by the tests of one module.
+
+    For tests that only need somewhere to put a file; give each file a name of
+    its own (e.g. from request.node.name) so tests don't see each other's.
+    """
+    config_dir = tmp_path_factory.mktemp("netwatcher_cfg") / ".config" / "netwatcher"
+    config_dir.mkdir(parents=True)
+    return config_dir
+
+
 @pytest.fixture
 def mock_run_command():
     """Provide a mock for run_command function."""
@@ -129,18 +238,17 @@ def mock_primary_service():
     return ("USB 10/100/1000 LAN", "en0", "12345678-1234-1234-1234-123456789012")
 
 
-@pytest.fixture(autouse=True)
+@pytest.fixture(autouse=True, scope="module")
 def reset_logging():
-    """Reset logging configuration between tests."""
+    """Reset logging configuration around each test module."""
     import logging
 
     # Clear all handlers
     root_logger = logging.getLogger()
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
+    root_logger.handlers.clear()
     # Reset to default level
     root_logger.setLevel(logging.WARNING)
     yield
-    # Cleanup after test
-    for handler in root_logger.handlers[:]:
-        root_logger.removeHandler(handler)
+    # Cleanup after the module, if anything was attached
+    if root_logger.handlers:
+        root_logger.handlers.clear()
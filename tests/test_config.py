@@ -4,21 +4,23 @@ Unit tests for src/config.py
 Tests configuration loading and constants.
 """
 
+import io
 import pytest
 from pathlib import Path
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 import toml
 
+from src import config
+
 
 @pytest.mark.unit
 class TestConfigLoading:
     """Tests for configuration loading."""
 
-    def test_load_config_creates_default(self, temp_config_dir):
+    @pytest.mark.fs
+    def test_load_config_creates_default(self, shared_config_dir, request):
         """Test that load_config creates default config if none exists."""
-        from src import config
-
-        config_file = temp_config_dir / "config.toml"
+        config_file = shared_config_dir / f"{request.node.name}.toml"
 
         with patch("src.config.get_config_path", return_value=config_file):
             result = config.load_config()
@@ -29,13 +31,15 @@ class TestConfigLoading:
             assert result["settings"]["debug"] == False
             assert result["settings"]["debounce_seconds"] == 5
 
-    def test_load_existing_config(self, temp_config_dir, mock_config):
-        """Test loading an existing config file."""
-        from src import config
+            # The result is a private copy; changing it must not touch the defaults
+            result["settings"]["debug"] = True
+            assert config.DEFAULT_CONFIG["settings"]["debug"] is False
 
-        config_file = temp_config_dir / "config.toml"
-        with open(config_file, "w") as f:
-            toml.dump(mock_config, f)
+    @pytest.mark.fs
+    def test_load_existing_config(self, shared_config_dir, request, mock_config, mock_config_toml_bytes):
+        """Test loading an existing config file."""
+        config_file = shared_config_dir / f"{request.node.name}.toml"
+        config_file.write_bytes(mock_config_toml_bytes)
 
         with patch("src.config.get_config_path", return_value=config_file):
             result = config.load_config()
@@ -44,6 +48,25 @@ class TestConfigLoading:
             assert "Home" in result["locations"]
             assert "Office" in result["locations"]
 
+    @pytest.mark.fs
+    def test_load_config_cached_reparses_only_on_change(self, temp_config_dir, mock_config):
+        """Test that the cached loader reuses the parse until the file changes."""
+        config_file = temp_config_dir / "config.toml"
+        config_file.write_text(toml.dumps(mock_config))
+
+        with patch("src.config.get_config_path", return_value=config_file), patch(
+            "src.config._config_cache", None
+        ):
+            first = config.load_config_cached()
+            assert config.load_config_cached() is first
+
+            mock_config["settings"]["debug"] = not mock_config["settings"]["debug"]
+            config_file.write_text(toml.dumps(mock_config) + "\n# edited\n")
+
+            reloaded = config.load_config_cached()
+            assert reloaded is not first
+            assert reloaded["settings"]["debug"] == mock_config["settings"]["debug"]
+
     def test_config_uses_stdlib_logging(self):
         """
         CRITICAL: Test that config.py uses stdlib logging to avoid
@@ -54,17 +77,16 @@ class TestConfigLoading:
 
         # This test verifies the fix where we changed from get_logger()
         # to stdlib logging.getLogger() to avoid auto-init
-        with patch("src.config.Path") as mock_path_cls:
-            mock_path = mock_path_cls.return_value
-            mock_path.exists.return_value = False
-            mock_path.parent.mkdir = lambda **kwargs: None
-
-            # Mock the file operations
-            with patch("builtins.open", mock_open()):
-                with patch("toml.dump"):
-                    # Should not raise ImportError or initialization errors
-                    result = config.load_config()
-                    assert result is not None
+        # Patch only the filesystem calls load_config makes, not the whole class
+        with (
+            patch.object(config.Path, "exists", return_value=False),
+            patch.object(config.Path, "mkdir", return_value=None),
+            patch("builtins.open", return_value=io.StringIO()),
+            patch("toml.dump"),
+        ):
+            # Should not raise ImportError or initialization errors
+            result = config.load_config()
+            assert result is not None
 
 
 @pytest.mark.unit
@@ -73,16 +95,12 @@ class TestConfigConstants:
 
     def test_app_constants(self):
         """Test that app constants are defined."""
-        from src import config
-
         assert config.APP_NAME == "netwatcher"
         assert "netwatcher" in config.PLIST_FILENAME
         assert "netwatcher" in config.LAUNCH_AGENT_LABEL
 
     def test_network_constants(self):
         """Test that network constants are defined."""
-        from src import config
-
         assert config.DEFAULT_NTP_SERVER == "time.apple.com"
         assert config.DEFAULT_DEBOUNCE_SECONDS == 5
         assert config.IPINFO_TIMEOUT > 0
@@ -90,8 +108,6 @@ class TestConfigConstants:
 
     def test_default_location_config(self):
         """Test default location configuration structure."""
-        from src import config
-
         default_loc = config.DEFAULT_LOCATION_CONFIG
         assert "ssids" in default_loc
         assert "dns_servers" in default_loc
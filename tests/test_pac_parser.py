@@ -0,0 +1,157 @@
+"""
+Unit tests for src/network/pac_parser.py
+
+Tests PAC file download and how PAC evaluation walks the probe URLs before
+settling on DIRECT.
+"""
+
+import http.client
+import io
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.network.pac_parser import PAC_MAX_BYTES, PAC_MAX_REDIRECTS, PAC_PROBE_URLS, _download_pac, _resolve_pac_raw
+
+TEST_URL = "http://effinthing.com"
+
+PAC_BODY = "function FindProxyForURL(url, host) { return \"DIRECT\"; }"
+
+pytestmark = pytest.mark.unit
+
+
+class TestDownloadPac:
+    """Tests for _download_pac function."""
+
+    @pytest.fixture
+    def http_responses(self):
+        """
+        Patch HTTPConnection to serve queued (status, headers, body) responses.
+
+        Yields a namespace; each connection answers with the next entry of
+        ``responses`` and records its (host, path) in ``requests``.
+        """
+        server = SimpleNamespace(responses=[], requests=[])
+
+        def connect(host, port=None, timeout=None):
+            status, headers, body = server.responses.pop(0)
+            response = SimpleNamespace(
+                status=status,
+                reason="Reason",
+                getheader=headers.get,
+                read=io.BytesIO(body).read,
+            )
+            return SimpleNamespace(
+                request=lambda method, path: server.requests.append((host, path)),
+                getresponse=lambda: response,
+                close=lambda: None,
+            )
+
+        with patch("http.client.HTTPConnection", side_effect=connect):
+            yield server
+
+    def test_relative_redirect(self, http_responses):
+        """Test that a relative Location is resolved against the current URL."""
+        http_responses.responses += [
+            (302, {"Location": "/proxy/wpad.dat?v=2"}, b""),
+            (200, {}, PAC_BODY.encode()),
+        ]
+
+        assert _download_pac("http://wpad.company.com/wpad.dat") == PAC_BODY
+        assert http_responses.requests == [
+            ("wpad.company.com", "/wpad.dat"),
+            ("wpad.company.com", "/proxy/wpad.dat?v=2"),
+        ]
+
+    def test_too_many_redirects(self, http_responses):
+        """Test that a redirect loop gives up after PAC_MAX_REDIRECTS hops."""
+        http_responses.responses += [(301, {"Location": "/wpad.dat"}, b"")] * (PAC_MAX_REDIRECTS + 1)
+
+        with pytest.raises(http.client.HTTPException, match="Too many redirects"):
+            _download_pac("http://wpad/wpad.dat")
+        assert len(http_responses.requests) == PAC_MAX_REDIRECTS + 1
+
+    @pytest.mark.fs
+    def test_redirect_to_file_refused(self, http_responses, tmp_path):
+        """Test that a server cannot redirect the download to a local file."""
+        secret = tmp_path / "secret"
+        secret.write_text(PAC_BODY)
+        http_responses.responses.append((302, {"Location": secret.as_uri()}, b""))
+
+        with pytest.raises(http.client.HTTPException, match="Refusing PAC redirect"):
+            _download_pac("http://wpad/wpad.dat")
+
+    def test_oversized_body_refused(self, http_responses):
+        """Test that a PAC larger than PAC_MAX_BYTES is refused, not truncated."""
+        http_responses.responses.append((200, {}, b"x" * (PAC_MAX_BYTES + 1)))
+
+        with pytest.raises(http.client.HTTPException, match="exceeds"):
+            _download_pac("http://wpad/wpad.dat")
+
+    def test_non_200_response(self, http_responses):
+        """Test that an error status raises instead of returning the body."""
+        http_responses.responses.append((404, {}, b"not found"))
+
+        with pytest.raises(http.client.HTTPException, match="HTTP 404"):
+            _download_pac("http://wpad/wpad.dat")
+
+    @pytest.mark.fs
+    def test_file_url(self, tmp_path):
+        """Test that a configured file: URL is read from disk."""
+        pac_file = tmp_path / "proxy.pac"
+        pac_file.write_text(PAC_BODY)
+
+        assert _download_pac(pac_file.as_uri()) == PAC_BODY
+
+
+class TestResolvePacRaw:
+    """Tests for _resolve_pac_raw function."""
+
+    @pytest.fixture
+    def fake_pacparser(self, mock_pac_file_content):
+        """
+        Install a stand-in pacparser module answering from a {url: result} dict.
+
+        Yields the dict; URLs not in it evaluate to DIRECT. Evaluated URLs are
+        recorded in ``evaluated``.
+        """
+        results = {}
+        evaluated = []
+
+        def find_proxy(url, host):
+            evaluated.append(url)
+            return results.get(url, "DIRECT")
+
+        module = SimpleNamespace(
+            init=lambda: None,
+            parse_pac_string=lambda content: None,
+            find_proxy=find_proxy,
+            cleanup=lambda: None,
+        )
+        with (
+            patch.dict("sys.modules", {"pacparser": module}),
+            patch("src.network.pac_parser._download_pac", return_value=mock_pac_file_content),
+        ):
+            yield SimpleNamespace(results=results, evaluated=evaluated)
+
+    def test_stops_at_first_proxy(self, fake_pacparser):
+        """Test that probing stops once a URL is sent through a proxy."""
+        fake_pacparser.results[TEST_URL] = "PROXY proxy.company.com:8080; DIRECT"
+
+        assert _resolve_pac_raw("http://wpad/wpad.dat") == "PROXY proxy.company.com:8080; DIRECT"
+        assert fake_pacparser.evaluated == [TEST_URL]
+
+    def test_direct_first_result_keeps_probing(self, fake_pacparser):
+        """Test that a DIRECT-first result does not end probing early."""
+        fake_pacparser.results[TEST_URL] = "DIRECT; PROXY fallback.company.com:8080"
+        fake_pacparser.results[PAC_PROBE_URLS[0]] = "PROXY proxy.company.com:8080"
+
+        assert _resolve_pac_raw("http://wpad/wpad.dat") == "PROXY proxy.company.com:8080"
+        assert fake_pacparser.evaluated == [TEST_URL, PAC_PROBE_URLS[0]]
+
+    def test_all_direct(self, fake_pacparser):
+        """Test that DIRECT is returned only after every probe URL went direct."""
+        fake_pacparser.results[TEST_URL] = "DIRECT; PROXY fallback.company.com:8080"
+
+        assert _resolve_pac_raw("http://wpad/wpad.dat") == "DIRECT"
+        assert fake_pacparser.evaluated == [TEST_URL, *PAC_PROBE_URLS]
@@ -6,138 +6,65 @@ the critical bugs we fixed during refactoring.
 """
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 import urllib.request
 
+from src.network.proxy_detection import (
+    get_proxy_url_for_shell,
+    get_system_proxy_config,
+    get_urllib_proxy_handler,
+)
+
 
 @pytest.mark.unit
 class TestGetSystemProxyConfig:
     """Tests for get_system_proxy_config function."""
 
-    def test_pac_proxy_detection(self, mock_networksetup_outputs, mock_primary_service):
-        """Test detection of PAC proxy configuration."""
-        from src.network.proxy_detection import get_system_proxy_config
+    @pytest.mark.parametrize(
+        "configured, expected",
+        [
+            # PAC is checked first and wins over everything else
+            ({"-getautoproxyurl": "pac_proxy"}, ("pac", "http://wpad.company.com/wpad.dat")),
+            # PAC (none), HTTP (found); HTTP wins over the later types
+            (
+                {
+                    "-getwebproxy": "http_proxy",
+                    "-getsecurewebproxy": "https_proxy",
+                    "-getsocksfirewallproxy": "socks_proxy",
+                },
+                ("http", "proxy.company.com:8080"),
+            ),
+            # PAC (none), HTTP (none), HTTPS (found)
+            (
+                {"-getsecurewebproxy": "https_proxy", "-getsocksfirewallproxy": "socks_proxy"},
+                ("https", "proxy-secure.company.com:8443"),
+            ),
+            # All checks return none until SOCKS
+            ({"-getsocksfirewallproxy": "socks_proxy"}, ("socks", "socks.company.com:1080")),
+            # Nothing configured
+            ({}, (None, None)),
+        ],
+        ids=["pac", "http", "https", "socks", "none"],
+    )
+    def test_proxy_detection(self, configured, expected, mock_networksetup_outputs, mock_primary_service):
+        """Test that the first configured proxy type is detected, in priority order."""
+
+        def networksetup_batch(flags, service):
+            # Answer whichever queries are made; any proxy type not configured is off
+            return {flag: mock_networksetup_outputs[configured.get(flag, "no_proxy")] for flag in flags}
 
         with (
             patch(
-                "src.network.proxy_detection.get_primary_service_interface"
-            ) as mock_get_primary,
-            patch("src.network.proxy_detection.run_command") as mock_run,
+                "src.network.proxy_detection.get_primary_service_interface",
+                return_value=mock_primary_service,
+            ),
+            patch("src.network.proxy_detection._networksetup_batch", side_effect=networksetup_batch) as mock_run,
         ):
-
-            mock_get_primary.return_value = mock_primary_service
-            mock_run.return_value = mock_networksetup_outputs["pac_proxy"]
-
-            proxy_type, proxy_value = get_system_proxy_config()
-
-            assert proxy_type == "pac"
-            assert proxy_value == "http://wpad.company.com/wpad.dat"
+            assert get_system_proxy_config() == expected
             mock_run.assert_called_once()
 
-    def test_http_proxy_detection(
-        self, mock_networksetup_outputs, mock_primary_service
-    ):
-        """Test detection of manual HTTP proxy configuration."""
-        from src.network.proxy_detection import get_system_proxy_config
-
-        with (
-            patch(
-                "src.network.proxy_detection.get_primary_service_interface"
-            ) as mock_get_primary,
-            patch("src.network.proxy_detection.run_command") as mock_run,
-        ):
-
-            mock_get_primary.return_value = mock_primary_service
-
-            # Mock returns: first call for PAC (none), second call for HTTP (found)
-            mock_run.side_effect = [
-                mock_networksetup_outputs["no_proxy"],  # PAC check
-                mock_networksetup_outputs["http_proxy"],  # HTTP check
-            ]
-
-            proxy_type, proxy_value = get_system_proxy_config()
-
-            assert proxy_type == "http"
-            assert proxy_value == "proxy.company.com:8080"
-
-    def test_https_proxy_detection(
-        self, mock_networksetup_outputs, mock_primary_service
-    ):
-        """Test detection of manual HTTPS proxy configuration."""
-        from src.network.proxy_detection import get_system_proxy_config
-
-        with (
-            patch(
-                "src.network.proxy_detection.get_primary_service_interface"
-            ) as mock_get_primary,
-            patch("src.network.proxy_detection.run_command") as mock_run,
-        ):
-
-            mock_get_primary.return_value = mock_primary_service
-
-            # Mock returns: PAC (none), HTTP (none), HTTPS (found)
-            mock_run.side_effect = [
-                mock_networksetup_outputs["no_proxy"],  # PAC
-                mock_networksetup_outputs["no_proxy"],  # HTTP
-                mock_networksetup_outputs["https_proxy"],  # HTTPS
-            ]
-
-            proxy_type, proxy_value = get_system_proxy_config()
-
-            assert proxy_type == "https"
-            assert proxy_value == "proxy-secure.company.com:8443"
-
-    def test_socks_proxy_detection(
-        self, mock_networksetup_outputs, mock_primary_service
-    ):
-        """Test detection of SOCKS proxy configuration."""
-        from src.network.proxy_detection import get_system_proxy_config
-
-        with (
-            patch(
-                "src.network.proxy_detection.get_primary_service_interface"
-            ) as mock_get_primary,
-            patch("src.network.proxy_detection.run_command") as mock_run,
-        ):
-
-            mock_get_primary.return_value = mock_primary_service
-
-            # Mock returns: all checks return none until SOCKS
-            mock_run.side_effect = [
-                mock_networksetup_outputs["no_proxy"],  # PAC
-                mock_networksetup_outputs["no_proxy"],  # HTTP
-                mock_networksetup_outputs["no_proxy"],  # HTTPS
-                mock_networksetup_outputs["socks_proxy"],  # SOCKS
-            ]
-
-            proxy_type, proxy_value = get_system_proxy_config()
-
-            assert proxy_type == "socks"
-            assert proxy_value == "socks.company.com:1080"
-
-    def test_no_proxy_configured(self, mock_networksetup_outputs, mock_primary_service):
-        """Test when no proxy is configured."""
-        from src.network.proxy_detection import get_system_proxy_config
-
-        with (
-            patch(
-                "src.network.proxy_detection.get_primary_service_interface"
-            ) as mock_get_primary,
-            patch("src.network.proxy_detection.run_command") as mock_run,
-        ):
-
-            mock_get_primary.return_value = mock_primary_service
-            mock_run.return_value = mock_networksetup_outputs["no_proxy"]
-
-            proxy_type, proxy_value = get_system_proxy_config()
-
-            assert proxy_type is None
-            assert proxy_value is None
-
     def test_no_primary_service(self):
         """Test when no primary service is available."""
-        from src.network.proxy_detection import get_system_proxy_config
-
         with patch(
             "src.network.proxy_detection.get_primary_service_interface"
         ) as mock_get_primary:
@@ -153,155 +80,102 @@ class TestGetSystemProxyConfig:
 class TestGetUrllibProxyHandler:
     """Tests for get_urllib_proxy_handler function - CRITICAL for bug prevention."""
 
-    def test_pac_proxy_handler_no_double_http(self, mock_primary_service):
+    def test_pac_proxy_handler_no_double_http(self, multipatch):
         """
         CRITICAL: Test that PAC proxy doesn't add double 'http://' prefix.
 
         This test catches the bug we fixed where pac_parser returns
         'http://proxy:8080' but we were adding 'http://' again.
         """
-        from src.network.proxy_detection import get_urllib_proxy_handler
-
-        with (
-            patch("src.network.proxy_detection.get_system_proxy_config") as mock_config,
-            patch(
-                "src.network.proxy_detection.parse_pac_file_for_generic_url"
-            ) as mock_parse,
-        ):
-
-            mock_config.return_value = ("pac", "http://wpad/wpad.dat")
-            # pac_parser returns URL with http:// already
-            mock_parse.return_value = "http://proxy.company.com:8080"
-
-            handler = get_urllib_proxy_handler()
-
-            assert handler is not None
-            assert isinstance(handler, urllib.request.ProxyHandler)
-            # CRITICAL: Should NOT have double http://
-            assert handler.proxies["http"] == "http://proxy.company.com:8080"
-            assert handler.proxies["https"] == "http://proxy.company.com:8080"
-            # Make sure we don't have http://http://
-            assert "http://http://" not in handler.proxies["http"]
-
-    def test_pac_proxy_returns_direct(self, mock_primary_service):
+        mock_config, mock_parse = multipatch(
+            "src.network.proxy_detection.get_system_proxy_config",
+            "src.network.proxy_detection._resolve_pac_raw",
+        )
+        mock_config.return_value = ("pac", "http://wpad/wpad.dat")
+        # Raw PAC result; extraction adds http:// exactly once
+        mock_parse.return_value = "PROXY proxy.company.com:8080; DIRECT"
+
+        handler = get_urllib_proxy_handler()
+
+        assert handler is not None
+        assert isinstance(handler, urllib.request.ProxyHandler)
+        # CRITICAL: Should NOT have double http://
+        assert handler.proxies["http"] == "http://proxy.company.com:8080"
+        assert handler.proxies["https"] == "http://proxy.company.com:8080"
+        # Make sure we don't have http://http://
+        assert "http://http://" not in handler.proxies["http"]
+
+    def test_pac_proxy_returns_direct(self, multipatch):
         """Test that PAC file returning DIRECT results in no proxy."""
-        from src.network.proxy_detection import get_urllib_proxy_handler
-
-        with (
-            patch("src.network.proxy_detection.get_system_proxy_config") as mock_config,
-            patch(
-                "src.network.proxy_detection.parse_pac_file_for_generic_url"
-            ) as mock_parse,
-        ):
-
-            mock_config.return_value = ("pac", "http://wpad/wpad.dat")
-            mock_parse.return_value = "DIRECT"
-
+        mock_config, mock_parse = multipatch(
+            "src.network.proxy_detection.get_system_proxy_config",
+            "src.network.proxy_detection._resolve_pac_raw",
+        )
+        mock_config.return_value = ("pac", "http://wpad/wpad.dat")
+        mock_parse.return_value = "DIRECT"
+
+        handler = get_urllib_proxy_handler()
+
+        assert handler is None
+
+    @pytest.mark.parametrize(
+        "proxy_config, expected_proxies",
+        [
+            (
+                ("http", "proxy.company.com:8080"),
+                {"http": "http://proxy.company.com:8080", "https": "http://proxy.company.com:8080"},
+            ),
+            (
+                ("socks", "socks.company.com:1080"),
+                {"http": "socks://socks.company.com:1080", "socks": "socks://socks.company.com:1080"},
+            ),
+            # No proxy configuration returns None
+            ((None, None), None),
+        ],
+        ids=["http", "socks", "none"],
+    )
+    def test_manual_proxy_handler(self, proxy_config, expected_proxies):
+        """Test handler creation for manual HTTP and SOCKS proxies, and for no proxy."""
+        with patch("src.network.proxy_detection.get_system_proxy_config", return_value=proxy_config):
             handler = get_urllib_proxy_handler()
 
+        if expected_proxies is None:
             assert handler is None
-
-    def test_http_proxy_handler(self):
-        """Test manual HTTP proxy handler creation."""
-        from src.network.proxy_detection import get_urllib_proxy_handler
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = ("http", "proxy.company.com:8080")
-
-            handler = get_urllib_proxy_handler()
-
+        else:
             assert handler is not None
-            assert handler.proxies["http"] == "http://proxy.company.com:8080"
-            assert handler.proxies["https"] == "http://proxy.company.com:8080"
-
-    def test_socks_proxy_handler(self):
-        """Test SOCKS proxy handler creation."""
-        from src.network.proxy_detection import get_urllib_proxy_handler
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = ("socks", "socks.company.com:1080")
-
-            handler = get_urllib_proxy_handler()
-
-            assert handler is not None
-            assert handler.proxies["http"] == "socks://socks.company.com:1080"
-            assert handler.proxies["socks"] == "socks://socks.company.com:1080"
-
-    def test_no_proxy_returns_none(self):
-        """Test that no proxy configuration returns None."""
-        from src.network.proxy_detection import get_urllib_proxy_handler
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = (None, None)
-
-            handler = get_urllib_proxy_handler()
-
-            assert handler is None
+            for scheme, proxy_url in expected_proxies.items():
+                assert handler.proxies[scheme] == proxy_url
 
 
 @pytest.mark.unit
 class TestGetProxyUrlForShell:
     """Tests for get_proxy_url_for_shell function."""
 
-    def test_pac_proxy_resolved(self):
+    def test_pac_proxy_resolved(self, multipatch):
         """Test PAC proxy is resolved for shell use."""
-        from src.network.proxy_detection import get_proxy_url_for_shell
-
-        with (
-            patch("src.network.proxy_detection.get_system_proxy_config") as mock_config,
-            patch(
-                "src.network.proxy_detection.parse_pac_file_for_generic_url"
-            ) as mock_parse,
-        ):
-
-            mock_config.return_value = ("pac", "http://wpad/wpad.dat")
-            mock_parse.return_value = "http://proxy.company.com:8080"
-
-            result = get_proxy_url_for_shell(resolve_pac=True)
-
-            assert result == "http://proxy.company.com:8080"
-
-    def test_pac_proxy_not_resolved_when_disabled(self):
-        """Test PAC proxy returns None when resolve_pac=False."""
-        from src.network.proxy_detection import get_proxy_url_for_shell
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = ("pac", "http://wpad/wpad.dat")
-
-            result = get_proxy_url_for_shell(resolve_pac=False)
-
-            assert result is None
-
-    def test_http_proxy_for_shell(self):
-        """Test manual HTTP proxy for shell."""
-        from src.network.proxy_detection import get_proxy_url_for_shell
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = ("http", "proxy.company.com:8080")
-
-            result = get_proxy_url_for_shell()
-
-            assert result == "http://proxy.company.com:8080"
-
-    def test_socks_proxy_for_shell(self):
-        """Test SOCKS proxy for shell."""
-        from src.network.proxy_detection import get_proxy_url_for_shell
-
-        with patch(
-            "src.network.proxy_detection.get_system_proxy_config"
-        ) as mock_config:
-            mock_config.return_value = ("socks", "socks.company.com:1080")
-
-            result = get_proxy_url_for_shell()
-
-            assert result == "socks://socks.company.com:1080"
+        mock_config, mock_parse = multipatch(
+            "src.network.proxy_detection.get_system_proxy_config",
+            "src.network.proxy_detection._resolve_pac_raw",
+        )
+        mock_config.return_value = ("pac", "http://wpad/wpad.dat")
+        mock_parse.return_value = "PROXY proxy.company.com:8080; DIRECT"
+
+        result = get_proxy_url_for_shell(resolve_pac=True)
+
+        assert result == "http://proxy.company.com:8080"
+
+    @pytest.mark.parametrize(
+        "proxy_config, resolve_pac, expected",
+        [
+            # PAC proxy returns None when resolve_pac=False
+            (("pac", "http://wpad/wpad.dat"), False, None),
+            (("http", "proxy.company.com:8080"), True, "http://proxy.company.com:8080"),
+            (("socks", "socks.company.com:1080"), True, "socks://socks.company.com:1080"),
+            ((None, None), True, None),
+        ],
+        ids=["pac-unresolved", "http", "socks", "none"],
+    )
+    def test_proxy_url_for_shell(self, proxy_config, resolve_pac, expected):
+        """Test shell proxy URLs that don't need a PAC file evaluated."""
+        with patch("src.network.proxy_detection.get_system_proxy_config", return_value=proxy_config):
+            assert get_proxy_url_for_shell(resolve_pac=resolve_pac) == expected
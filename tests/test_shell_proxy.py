@@ -5,16 +5,59 @@ Tests shell proxy configuration, especially the critical bug fix
 where user-configured PAC URLs were being ignored.
 """
 
+import os
 import pytest
+import stat
+import toml
 from pathlib import Path
-from unittest.mock import patch, MagicMock, mock_open
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from src.network.shell_proxy import (
+    detect_user_shells,
+    ensure_shell_proxy_config,
+    get_shell_bypass_domains,
+    parse_proxy_config,
+    remove_shell_integration,
+    setup_shell_integration,
+    update_shell_proxy_configuration,
+    write_bash_proxy_env,
+    write_csh_proxy_env,
+    write_fish_proxy_env,
+)
+
+# Parsed proxy settings shared by the env file tests; treat as read-only
+PROXY_CONFIG = {
+    "http_proxy": "http://proxy:8080",
+    "https_proxy": "http://proxy:8080",
+    "ftp_proxy": "http://proxy:8080",
+    "all_proxy": "http://proxy:8080",
+    "rsync_proxy": "proxy:8080",
+    "no_proxy": "localhost,127.0.0.1",
+}
+
+pytestmark = pytest.mark.unit
 
 
-@pytest.mark.unit
 class TestParseProxyConfig:
     """Tests for parse_proxy_config function - CRITICAL for bug prevention."""
 
-    def test_user_configured_pac_url_is_used(self):
+    @pytest.fixture(autouse=True)
+    def pac(self, monkeypatch):
+        """Stub PAC evaluation for every test in the class; none may fetch a real PAC file.
+
+        Set ``pac.result`` to choose the PAC answer; ``pac.calls`` records the PAC URLs evaluated.
+        """
+        pac = SimpleNamespace(result=None, calls=[])
+
+        def fake_parse(pac_url):
+            pac.calls.append(pac_url)
+            return pac.result
+
+        monkeypatch.setattr("src.network.shell_proxy.parse_pac_file_for_generic_url", fake_parse)
+        return pac
+
+    def test_user_configured_pac_url_is_used(self, pac):
         """
         CRITICAL: Test that user-configured PAC URL from config is used.
 
@@ -22,42 +65,30 @@ class TestParseProxyConfig:
         calling get_proxy_url_for_shell() which queried system proxy,
         instead of using the provided proxy_url parameter.
         """
-        from src.network.shell_proxy import parse_proxy_config
-
         user_pac_url = "http://my-custom-proxy.company.com/custom.pac"
 
-        with patch(
-            "src.network.pac_parser.parse_pac_file_for_generic_url"
-        ) as mock_parse:
-            # User's PAC file returns a specific proxy
-            mock_parse.return_value = "http://custom-proxy.company.com:9000"
+        # User's PAC file returns a specific proxy
+        pac.result = "http://custom-proxy.company.com:9000"
 
-            result = parse_proxy_config(user_pac_url)
+        result = parse_proxy_config(user_pac_url)
 
-            # CRITICAL: Must call parse_pac_file_for_generic_url with USER'S PAC URL
-            mock_parse.assert_called_once_with(user_pac_url)
+        # CRITICAL: Must call parse_pac_file_for_generic_url with USER'S PAC URL
+        assert pac.calls == [user_pac_url]
 
-            # Verify result uses the parsed proxy
-            assert result is not None
-            assert result["http_proxy"] == "http://custom-proxy.company.com:9000"
+        # Verify result uses the parsed proxy
+        assert result is not None
+        assert result["http_proxy"] == "http://custom-proxy.company.com:9000"
 
-    def test_pac_file_returning_direct(self):
+    def test_pac_file_returning_direct(self, pac):
         """Test PAC file returning DIRECT."""
-        from src.network.shell_proxy import parse_proxy_config
-
-        with patch(
-            "src.network.pac_parser.parse_pac_file_for_generic_url"
-        ) as mock_parse:
-            mock_parse.return_value = "DIRECT"
+        pac.result = "DIRECT"
 
-            result = parse_proxy_config("http://proxy.pac")
+        result = parse_proxy_config("http://proxy.pac")
 
-            assert result is None
+        assert result is None
 
     def test_manual_http_proxy(self):
         """Test manual HTTP proxy configuration."""
-        from src.network.shell_proxy import parse_proxy_config
-
         result = parse_proxy_config("http://proxy.company.com:8080")
 
         assert result is not None
@@ -68,207 +99,252 @@ class TestParseProxyConfig:
         assert result["rsync_proxy"] == "proxy.company.com:8080"  # No protocol
         assert "no_proxy" in result
 
-    def test_proxy_without_protocol(self):
-        """Test proxy URL without protocol prefix."""
-        from src.network.shell_proxy import parse_proxy_config
-
-        result = parse_proxy_config("proxy.company.com:8080")
-
-        assert result is not None
-        assert result["http_proxy"] == "http://proxy.company.com:8080"
-
-    def test_empty_proxy_url(self):
-        """Test empty proxy URL returns None."""
-        from src.network.shell_proxy import parse_proxy_config
-
-        result = parse_proxy_config("")
-        assert result is None
-
-    def test_none_proxy_url(self):
-        """Test 'none' proxy URL returns None."""
-        from src.network.shell_proxy import parse_proxy_config
-
-        result = parse_proxy_config("none")
-        assert result is None
+    @pytest.mark.parametrize(
+        "proxy_url, expected_http_proxy",
+        [
+            ("http://proxy.company.com:8080", "http://proxy.company.com:8080"),
+            # Proxy URL without protocol prefix gets http://
+            ("proxy.company.com:8080", "http://proxy.company.com:8080"),
+            # Empty and 'none' proxy URLs mean no proxy
+            ("", None),
+            ("none", None),
+        ],
+        ids=["with-protocol", "without-protocol", "empty", "none"],
+    )
+    def test_proxy_url_forms(self, proxy_url, expected_http_proxy):
+        """Test how each form of manual proxy URL is parsed."""
+        result = parse_proxy_config(proxy_url)
+
+        if expected_http_proxy is None:
+            assert result is None
+        else:
+            assert result is not None
+            assert result["http_proxy"] == expected_http_proxy
 
-    def test_additional_bypass_domains(self):
+    def test_additional_bypass_domains(self, monkeypatch):
         """Test that additional bypass domains are included."""
-        from src.network.shell_proxy import parse_proxy_config
-
-        with patch("src.network.shell_proxy.get_shell_bypass_domains") as mock_bypass:
-            mock_bypass.return_value = "localhost,127.0.0.1"
+        monkeypatch.setattr("src.network.shell_proxy._get_shell_bypass_list", lambda: ["localhost", "127.0.0.1"])
 
-            result = parse_proxy_config(
-                "http://proxy:8080",
-                additional_bypass_domains=["custom.com", "internal.local"],
-            )
+        result = parse_proxy_config(
+            "http://proxy:8080",
+            additional_bypass_domains=["custom.com", "internal.local"],
+        )
 
-            assert result is not None
-            # Additional domains should be in no_proxy
-            assert "custom.com" in result["no_proxy"]
-            assert "internal.local" in result["no_proxy"]
+        assert result is not None
+        # Additional domains should be in no_proxy
+        assert "custom.com" in result["no_proxy"]
+        assert "internal.local" in result["no_proxy"]
 
 
-@pytest.mark.unit
 class TestGetShellBypassDomains:
     """Tests for get_shell_bypass_domains function."""
 
-    def test_standard_bypass_domains_included(self):
+    def test_standard_bypass_domains_included(self, monkeypatch):
         """Test that standard bypass domains are included."""
-        from src.network.shell_proxy import get_shell_bypass_domains
-
-        with patch(
-            "src.network.shell_proxy.get_bypass_domains_from_resolver_files"
-        ) as mock_resolver:
-            mock_resolver.return_value = []
+        monkeypatch.setattr("src.network.shell_proxy.get_bypass_domains_from_resolver_files", lambda: [])
 
-            result = get_shell_bypass_domains()
+        result = get_shell_bypass_domains()
 
-            assert "localhost" in result
-            assert "127.0.0.1" in result
-            assert "*.local" in result
+        assert "localhost" in result
+        assert "127.0.0.1" in result
+        assert "*.local" in result
 
-    def test_resolver_domains_included(self):
+    def test_resolver_domains_included(self, monkeypatch):
         """Test that /etc/resolver domains are included."""
-        from src.network.shell_proxy import get_shell_bypass_domains
+        monkeypatch.setattr(
+            "src.network.shell_proxy.get_bypass_domains_from_resolver_files",
+            lambda: ["corp.company.com", "internal.local"],
+        )
 
-        with patch(
-            "src.network.shell_proxy.get_bypass_domains_from_resolver_files"
-        ) as mock_resolver:
-            mock_resolver.return_value = ["corp.company.com", "internal.local"]
+        result = get_shell_bypass_domains()
 
-            result = get_shell_bypass_domains()
+        assert "corp.company.com" in result
+        assert "internal.local" in result
 
-            assert "corp.company.com" in result
-            assert "internal.local" in result
 
-
-@pytest.mark.unit
+@pytest.mark.fs
 class TestWriteShellProxyFiles:
     """Tests for shell proxy file writing functions."""
 
-    def test_write_bash_proxy_env_with_proxy(self, temp_config_dir):
-        """Test writing bash proxy environment file."""
-        from src.network.shell_proxy import write_bash_proxy_env
-
-        proxy_config = {
-            "http_proxy": "http://proxy:8080",
-            "https_proxy": "http://proxy:8080",
-            "ftp_proxy": "http://proxy:8080",
-            "all_proxy": "http://proxy:8080",
-            "rsync_proxy": "proxy:8080",
-            "no_proxy": "localhost,127.0.0.1",
-        }
-
-        cache_file = temp_config_dir / "proxy.env.sh"
-
-        with patch("pathlib.Path.home", return_value=temp_config_dir.parent.parent):
-            write_bash_proxy_env(proxy_config)
-
-            assert cache_file.exists()
-            content = cache_file.read_text()
-            assert 'export http_proxy="http://proxy:8080"' in content
-            assert 'export no_proxy="localhost,127.0.0.1"' in content
+    @pytest.fixture(autouse=True)
+    def env_dir(self, shared_config_dir, monkeypatch):
+        """Point Path.home() at the module's shared config directory, emptied after each test."""
+        monkeypatch.setattr(Path, "home", staticmethod(lambda: shared_config_dir.parent.parent))
+        yield shared_config_dir
+        for leftover in shared_config_dir.glob("proxy.env.*"):
+            leftover.unlink()
 
-    def test_write_bash_proxy_env_without_proxy(self, temp_config_dir):
+    def test_write_bash_proxy_env_without_proxy(self, env_dir):
         """Test removing bash proxy environment file when no proxy."""
-        from src.network.shell_proxy import write_bash_proxy_env
-
-        cache_file = temp_config_dir / "proxy.env.sh"
+        cache_file = env_dir / "proxy.env.sh"
         cache_file.write_text("# Old proxy config")
 
-        with patch("pathlib.Path.home", return_value=temp_config_dir.parent.parent):
-            write_bash_proxy_env(None)
-
-            assert not cache_file.exists()
-
-    def test_write_csh_proxy_env_with_proxy(self, temp_config_dir):
-        """Test writing csh proxy environment file."""
-        from src.network.shell_proxy import write_csh_proxy_env
-
-        proxy_config = {
-            "http_proxy": "http://proxy:8080",
-            "https_proxy": "http://proxy:8080",
-            "ftp_proxy": "http://proxy:8080",
-            "all_proxy": "http://proxy:8080",
-            "rsync_proxy": "proxy:8080",
-            "no_proxy": "localhost,127.0.0.1",
-        }
-
-        cache_file = temp_config_dir / "proxy.env.csh"
-
-        with patch("pathlib.Path.home", return_value=temp_config_dir.parent.parent):
-            write_csh_proxy_env(proxy_config)
+        write_bash_proxy_env(None)
+
+        assert not cache_file.exists()
+
+    @pytest.mark.parametrize(
+        "writer, file_name, expected_lines",
+        [
+            (
+                write_bash_proxy_env,
+                "proxy.env.sh",
+                ('export http_proxy="http://proxy:8080"', 'export no_proxy="localhost,127.0.0.1"'),
+            ),
+            (
+                write_csh_proxy_env,
+                "proxy.env.csh",
+                ('setenv http_proxy "http://proxy:8080"', 'setenv no_proxy "localhost,127.0.0.1"'),
+            ),
+            (
+                write_fish_proxy_env,
+                "proxy.env.fish",
+                ('set -x http_proxy "http://proxy:8080"', 'set -x no_proxy "localhost,127.0.0.1"'),
+            ),
+        ],
+        ids=["bash", "csh", "fish"],
+    )
+    def test_write_proxy_env_with_proxy(self, env_dir, writer, file_name, expected_lines):
+        """Test writing each shell's proxy environment file."""
+        cache_file = env_dir / file_name
+
+        writer(PROXY_CONFIG)
+
+        assert cache_file.exists()
+        lines = frozenset(cache_file.read_text().splitlines())
+        for line in expected_lines:
+            assert line in lines
+
+    def test_new_proxy_env_gets_umask_default_mode(self, env_dir):
+        """Test that a new env file gets the usual 0666-less-umask mode, not 0600."""
+        cache_file = env_dir / "proxy.env.sh"
+        umask = os.umask(0o022)
+        os.umask(umask)
+
+        write_bash_proxy_env(PROXY_CONFIG)
+
+        assert stat.S_IMODE(cache_file.stat().st_mode) == 0o666 & ~umask
+
+    def test_replaced_proxy_env_keeps_mode(self, env_dir):
+        """Test that replacing an env file keeps the existing file's mode."""
+        cache_file = env_dir / "proxy.env.sh"
+        cache_file.write_text("# Old proxy config")
+        cache_file.chmod(0o640)
 
-            assert cache_file.exists()
-            content = cache_file.read_text()
-            assert 'setenv http_proxy "http://proxy:8080"' in content
+        write_bash_proxy_env(PROXY_CONFIG)
 
-    def test_write_fish_proxy_env_with_proxy(self, temp_config_dir):
-        """Test writing fish proxy environment file."""
-        from src.network.shell_proxy import write_fish_proxy_env
+        assert 'export http_proxy="http://proxy:8080"' in cache_file.read_text().splitlines()
+        assert stat.S_IMODE(cache_file.stat().st_mode) == 0o640
 
-        proxy_config = {
-            "http_proxy": "http://proxy:8080",
-            "https_proxy": "http://proxy:8080",
-            "ftp_proxy": "http://proxy:8080",
-            "all_proxy": "http://proxy:8080",
-            "rsync_proxy": "proxy:8080",
-            "no_proxy": "localhost,127.0.0.1",
-        }
+    def test_unchanged_proxy_env_is_not_rewritten(self, env_dir):
+        """Test that identical content leaves the existing file untouched."""
+        cache_file = env_dir / "proxy.env.sh"
 
-        cache_file = temp_config_dir / "proxy.env.fish"
+        write_bash_proxy_env(PROXY_CONFIG)
+        before = cache_file.stat()
 
-        with patch("pathlib.Path.home", return_value=temp_config_dir.parent.parent):
-            write_fish_proxy_env(proxy_config)
+        with patch("src.network.shell_proxy.os.replace") as mock_replace:
+            write_bash_proxy_env(PROXY_CONFIG)
 
-            assert cache_file.exists()
-            content = cache_file.read_text()
-            assert 'set -x http_proxy "http://proxy:8080"' in content
+        mock_replace.assert_not_called()
+        assert cache_file.stat().st_ino == before.st_ino
+        assert cache_file.stat().st_mtime_ns == before.st_mtime_ns
 
 
-@pytest.mark.unit
+@pytest.mark.fs
 class TestDetectUserShells:
     """Tests for detect_user_shells function."""
 
-    def test_detect_bash_shell(self, tmp_path):
-        """Test detecting bash shell."""
-        from src.network.shell_proxy import detect_user_shells
-
-        bash_profile = tmp_path / ".bash_profile"
-        bash_profile.touch()
-
-        with (
-            patch("pathlib.Path.home", return_value=tmp_path),
-            patch("pwd.getpwuid") as mock_pwd,
-        ):
-
-            mock_user = MagicMock()
-            mock_user.pw_shell = "/bin/bash"
-            mock_pwd.return_value = mock_user
-
-            shells, primary = detect_user_shells()
-
-            assert "bash" in shells
-            assert primary == "bash"
-
-    def test_detect_zsh_shell(self, tmp_path):
-        """Test detecting zsh shell."""
-        from src.network.shell_proxy import detect_user_shells
-
-        zshrc = tmp_path / ".zshrc"
-        zshrc.touch()
-
-        with (
-            patch("pathlib.Path.home", return_value=tmp_path),
-            patch("pwd.getpwuid") as mock_pwd,
-        ):
-
-            mock_user = MagicMock()
-            mock_user.pw_shell = "/bin/zsh"
-            mock_pwd.return_value = mock_user
-
+    @pytest.fixture(autouse=True)
+    def home(self, tmp_path, monkeypatch):
+        """Point Path.home() at a temporary directory."""
+        monkeypatch.setattr(Path, "home", staticmethod(lambda: tmp_path))
+        return tmp_path
+
+    @pytest.mark.parametrize(
+        "login_shell, rc_file, expected",
+        [
+            ("/bin/bash", ".bash_profile", "bash"),
+            ("/bin/zsh", ".zshrc", "zsh"),
+        ],
+        ids=["bash", "zsh"],
+    )
+    def test_detect_shell(self, home, login_shell, rc_file, expected):
+        """Test detecting the user's login shell from its rc file."""
+        (home / rc_file).touch()
+
+        with patch("pwd.getpwuid", return_value=SimpleNamespace(pw_shell=login_shell)):
             shells, primary = detect_user_shells()
 
-            assert "zsh" in shells
-            assert primary == "zsh"
+        assert expected in shells
+        assert primary == expected
+
+
+@pytest.mark.fs
+class TestRemoveShellIntegration:
+    """Tests for remove_shell_integration function."""
+
+    @pytest.fixture(autouse=True)
+    def home(self, tmp_path, monkeypatch):
+        """Point Path.home() at a temporary directory."""
+        monkeypatch.setattr(Path, "home", staticmethod(lambda: tmp_path))
+        return tmp_path
+
+    def test_removes_block_and_keeps_surrounding_lines(self, home):
+        """Test that only the NetWatcher block is removed from the rc file."""
+        zshrc = home / ".zshrc"
+        zshrc.write_text("export BEFORE=1\n")
+
+        setup_shell_integration("zsh")
+        zshrc.write_text(zshrc.read_text() + "export AFTER=1\n")
+
+        remove_shell_integration("zsh")
+
+        assert zshrc.read_text() == "export BEFORE=1\nexport AFTER=1\n"
+
+
+class TestUpdateShellProxyConfiguration:
+    """Tests for update_shell_proxy_configuration function."""
+
+    def test_unchanged_inputs_skip_rewrite(self):
+        """Test that a repeat call with the same inputs does no work."""
+        with patch("src.network.shell_proxy._last_shell_proxy_state", None), patch(
+            "src.network.shell_proxy._get_shell_bypass_list", return_value=["localhost"]
+        ), patch("src.network.shell_proxy.write_all_shell_proxy_files") as mock_write:
+            update_shell_proxy_configuration("http://proxy:8080", ["corp.example.com"])
+            update_shell_proxy_configuration("http://proxy:8080", ["corp.example.com"])
+            assert mock_write.call_count == 1
+
+            update_shell_proxy_configuration("http://other:3128", ["corp.example.com"])
+            assert mock_write.call_count == 2
+
+
+@pytest.mark.fs
+class TestEnsureShellProxyConfig:
+    """Tests for ensure_shell_proxy_config function."""
+
+    @pytest.mark.parametrize(
+        "content, keeps_comment",
+        [
+            ("# mine\n[settings]\ndebug = true\n", True),
+            ("# mine\n[ settings ]  # spaced\ndebug = true\n", True),
+            ("# mine\n[locations.Home]\ndns_servers = []\n", True),
+            # No header to edit; the config is rewritten from its parsed form
+            ("# mine\nsettings.debug = true\n", False),
+            ("# mine\nsettings = { debug = true }\n", False),
+        ],
+        ids=["header", "spaced-header", "no-settings", "dotted-keys", "inline-table"],
+    )
+    def test_adds_shell_proxy_enabled_once(self, tmp_path, content, keeps_comment):
+        """Test that the option is added without creating a second [settings] table."""
+        config_file = tmp_path / "config.toml"
+        config_file.write_text(content)
+
+        with patch("src.network.shell_proxy.config.get_config_path", return_value=config_file):
+            assert ensure_shell_proxy_config()
+
+        updated = config_file.read_text()
+        settings = toml.loads(updated)["settings"]
+        assert settings["shell_proxy_enabled"] is True
+        assert settings.get("debug", True) is True
+        assert ("# mine" in updated) == keeps_comment